@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Benchmark da conversão planilha -> JSON dos estudantes
+Gera planilhas sintéticas no formato de estudantes_ficticios_corrigido_modelo.xlsx
+(com o gerador vetorizado de estudantes_sinteticos.py), mede cada etapa da
+conversão (leitura, normalização, serialização) e grava o resultado em JSON
+para acompanhar a evolução entre versões
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import estudantes_sinteticos
+from convert_excel_to_json import (build_records, build_records_vectorized, convert_excel_to_json,
+                                   write_records, open_output, OUTPUT_FORMATS)
+from excel_stream import iter_excel_frames, DEFAULT_CHUNK_SIZE
+
+TAMANHOS_PADRAO = (1000, 10000, 100000, 500000)
+
+# vectorized/rowwise/streaming medem as etapas; convert mede convert_excel_to_json inteiro
+MODOS = ('vectorized', 'rowwise', 'streaming', 'convert')
+MODOS_PADRAO = ('vectorized', 'streaming', 'convert')
+
+def synthesize_workbook(path, rows, seed=42):
+    """
+    Grava uma planilha com rows estudantes fictícios agrupados em famílias
+    (gerados por estudantes_sinteticos). A mesma semente gera sempre a mesma planilha
+    """
+    estudantes_sinteticos.write_xlsx(estudantes_sinteticos.iter_estudantes(rows, seed), path)
+
+def synthesized_workbook(rows, seed, workdir):
+    """Caminho da planilha sintética de rows estudantes, gerada só se ainda não existir"""
+    path = os.path.join(workdir, f"estudantes_{rows}_seed{seed}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(workdir, exist_ok=True)
+        inicio = time.perf_counter()
+        synthesize_workbook(path + ".tmp.xlsx", rows, seed)
+        os.replace(path + ".tmp.xlsx", path)
+        print(f"Planilha sintética com {rows} estudantes gerada em {time.perf_counter() - inicio:.1f}s: {path}")
+    return path
+
+# VmHWM é o pico deste processo; o ru_maxrss de um processo novo no Linux
+# herda o pico do processo pai (ex.: a geração da planilha sintética)
+PROC_STATUS = "/proc/self/status"
+
+def _fonte_memoria():
+    """Origem dos valores de memória registrada no relatório"""
+    if os.path.exists(PROC_STATUS):
+        return "VmHWM"
+    return "ru_maxrss" if resource is not None else "tracemalloc"
+
+def _pico_memoria_mb():
+    """
+    Pico de memória do processo até agora (VmHWM, ru_maxrss ou, no Windows,
+    tracemalloc). É cumulativo: inclui os imports e as etapas anteriores
+    """
+    if os.path.exists(PROC_STATUS):
+        with open(PROC_STATUS) as f:
+            for linha in f:
+                if linha.startswith("VmHWM:"):
+                    return round(int(linha.split()[1]) / 1024, 1)
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss vem em KB no Linux e em bytes no macOS
+        return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    import tracemalloc
+    return round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+
+def _medir(excel_file_path, output_file_path, modo, chunk_size, output_format):
+    """
+    Executa um modo da conversão e mede cada etapa. Roda num processo novo e
+    guarda o pico já atingido depois dos imports (baseline), para que o
+    consumo da conversão seja o pico final menos esse valor
+    """
+    if resource is None:
+        import tracemalloc
+        tracemalloc.start()
+    baseline = _pico_memoria_mb()
+
+    etapas = {}
+
+    def etapa(nome, inicio):
+        etapas[nome] = {"seconds": time.perf_counter() - inicio, "process_peak_memory_mb": _pico_memoria_mb()}
+
+    # As mensagens da conversão (resumos, exemplos) não interessam aqui
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if modo == 'convert':
+            inicio = time.perf_counter()
+            convert_excel_to_json(excel_file_path, output_file_path, vectorized=True,
+                                  output_format=output_format, use_cache=False)
+            etapa("total", inicio)
+        elif modo == 'streaming':
+            # Leitura e normalização se intercalam; a serialização é o restante do tempo
+            tempos = {"read": 0.0, "normalize": 0.0}
+
+            def registros():
+                frames = iter_excel_frames(excel_file_path, chunk_size)
+                while True:
+                    inicio_bloco = time.perf_counter()
+                    df = next(frames, None)
+                    tempos["read"] += time.perf_counter() - inicio_bloco
+                    if df is None:
+                        return
+                    inicio_bloco = time.perf_counter()
+                    records = build_records_vectorized(df)
+                    tempos["normalize"] += time.perf_counter() - inicio_bloco
+                    yield from records
+
+            inicio = time.perf_counter()
+            with open_output(output_file_path) as f:
+                write_records(f, registros(), output_format)
+            total = time.perf_counter() - inicio
+            pico = _pico_memoria_mb()
+            tempos["serialize"] = total - tempos["read"] - tempos["normalize"]
+            etapas = {nome: {"seconds": segundos} for nome, segundos in tempos.items()}
+            etapas["total"] = {"seconds": total, "process_peak_memory_mb": pico}
+        else:
+            inicio = time.perf_counter()
+            df = pd.read_excel(excel_file_path)
+            etapa("read", inicio)
+
+            inicio = time.perf_counter()
+            records = build_records_vectorized(df) if modo == 'vectorized' else build_records(df)
+            etapa("normalize", inicio)
+
+            inicio = time.perf_counter()
+            with open_output(output_file_path) as f:
+                write_records(f, records, output_format)
+            etapa("serialize", inicio)
+
+    if "total" not in etapas:
+        etapas["total"] = {"seconds": sum(e["seconds"] for e in etapas.values()),
+                           "process_peak_memory_mb": _pico_memoria_mb()}
+    etapas["total"]["baseline_memory_mb"] = baseline
+    etapas["total"]["output_bytes"] = os.path.getsize(output_file_path)
+    return etapas
+
+def run_benchmark(tamanhos=TAMANHOS_PADRAO, modos=MODOS_PADRAO, seed=42, workdir=".bench_planilhas",
+                  chunk_size=DEFAULT_CHUNK_SIZE, output_format='json', repeat=1):
+    """
+    Mede cada modo em cada tamanho de planilha e retorna o relatório.
+    Com repeat > 1 fica a execução mais rápida de cada combinação
+    """
+    resultados = []
+    contexto = get_context("spawn")
+    for rows in tamanhos:
+        excel_file_path = synthesized_workbook(rows, seed, workdir)
+        for modo in modos:
+            output_file_path = os.path.join(workdir, f"saida_{rows}_{modo}.json")
+            execucoes = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+                    execucoes.append(executor.submit(_medir, excel_file_path, output_file_path, modo,
+                                                     chunk_size, output_format).result())
+            etapas = min(execucoes, key=lambda e: e["total"]["seconds"])
+            tempos_execucoes = [round(e["total"]["seconds"], 4) for e in execucoes]
+            os.remove(output_file_path)
+
+            for valores in etapas.values():
+                valores["seconds"] = round(valores["seconds"], 4)
+                valores["rows_per_sec"] = round(rows / valores["seconds"]) if valores["seconds"] else None
+            total = etapas.pop("total")
+            resultados.append({
+                "rows": rows,
+                "mode": modo,
+                "workbook_bytes": os.path.getsize(excel_file_path),
+                "total_seconds": total["seconds"],
+                "rows_per_sec": total["rows_per_sec"],
+                "peak_memory_delta_mb": round(total["process_peak_memory_mb"] - total["baseline_memory_mb"], 1),
+                "process_peak_memory_mb": total["process_peak_memory_mb"],
+                "baseline_memory_mb": total["baseline_memory_mb"],
+                "output_bytes": total["output_bytes"],
+                "runs_seconds": tempos_execucoes,
+                "stages": etapas,
+            })
+            print(f"  {rows:>7} {modo:<10} {total['seconds']:>9.2f}s {total['rows_per_sec'] or 0:>9} linhas/s "
+                  f"{resultados[-1]['peak_memory_delta_mb']:>8} MB")
+
+    return {
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "memory_source": _fonte_memoria(),
+        "seed": seed,
+        "chunk_size": chunk_size,
+        "output_format": output_format,
+        "results": resultados,
+    }
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Benchmark da conversão planilha -> JSON dos estudantes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(TAMANHOS_PADRAO),
+                        help="Quantidades de estudantes das planilhas sintéticas")
+    parser.add_argument("--modes", nargs="+", choices=MODOS, default=list(MODOS_PADRAO),
+                        help="Modos de conversão medidos (rowwise é o caminho original, lento em planilhas grandes)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente das planilhas sintéticas")
+    parser.add_argument("--workdir", default=".bench_planilhas",
+                        help="Pasta das planilhas sintéticas (reaproveitadas entre execuções)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Linhas por bloco no modo streaming (padrão: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default='json', help="Formato de saída medido")
+    parser.add_argument("--repeat", type=int, default=1, help="Execuções por combinação (fica a mais rápida)")
+    parser.add_argument("--output", default="benchmark_conversao.json", help="Arquivo JSON com o resultado")
+    args = parser.parse_args()
+
+    print("=== BENCHMARK DA CONVERSÃO PLANILHA -> JSON ===")
+    relatorio = run_benchmark(args.sizes, args.modes, args.seed, args.workdir, args.chunk_size,
+                              args.format, max(args.repeat, 1))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\nResultado salvo em: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -5,86 +5,47 @@ Formato compatível com a função process_estudantes_batch do Supabase
 """
 
 import pandas as pd
+import numpy as np
 import json
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 import os
+import glob
+import gzip
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
-def convert_excel_to_json(excel_file_path, output_file_path):
+from openpyxl import load_workbook
+
+from excel_stream import iter_excel_frames, DEFAULT_CHUNK_SIZE
+from planilha_cache import read_excel_cached
+from estudantes_delta import load_snapshot, compute_delta, write_delta, write_manifest, stable_student_ids
+
+# Formatos de saída: array JSON com indent=2 (padrão), JSON Lines e array compacto
+OUTPUT_FORMATS = ('json', 'ndjson', 'compact')
+
+def convert_excel_to_json(excel_file_path, output_file_path, vectorized=False, output_format='json', compress=False,
+                          use_cache=True):
     """
     Converte o arquivo Excel para JSON no formato esperado pelo Supabase
     """
     try:
         # Ler o arquivo Excel
         print(f"Lendo arquivo Excel: {excel_file_path}")
-        df = pd.read_excel(excel_file_path)
+        df = read_excel_cached(excel_file_path, use_cache=use_cache)
         
         print(f"Total de registros encontrados: {len(df)}")
         print(f"Colunas disponíveis: {list(df.columns)}")
         
-        # Lista para armazenar os registros convertidos
-        records = []
-        
-        # Processar cada linha
-        for index, row in df.iterrows():
-            try:
-                # Criar registro com mapeamento das colunas
-                record = {
-                    # Campos obrigatórios
-                    "id": str(row.get('id', gen_uuid())),
-                    "nome": str(row.get('nome', '')).strip(),
-                    
-                    # Campos opcionais com valores padrão
-                    "sobrenome": str(row.get('Sobrenome', '')).strip() if pd.notna(row.get('Sobrenome')) else None,
-                    "idade": int(row.get('idade', 0)) if pd.notna(row.get('idade')) and row.get('idade') > 0 else None,
-                    "genero": normalize_genero(row.get('genero', '')),
-                    "email": str(row.get('email', '')).strip() if pd.notna(row.get('email')) else None,
-                    "telefone": str(row.get('telefone', '')).strip() if pd.notna(row.get('telefone')) else None,
-                    "data_batismo": normalize_date(row.get('data_batismo')),
-                    "servico": str(row.get('servico', '')).strip() if pd.notna(row.get('servico')) else None,
-                    "cargo": normalize_cargo(row.get('cargo', '')),
-                    "id_pai_mae": str(row.get('id_pai_mae', '')) if pd.notna(row.get('id_pai_mae')) and str(row.get('id_pai_mae')) != 'nan' else None,
-                    "ativo": bool(row.get('ativo', True)) if pd.notna(row.get('ativo')) else True,
-                    "observacoes": str(row.get('observacoes', '')).strip() if pd.notna(row.get('observacoes')) and str(row.get('observacoes')) != 'desconhecido' else None,
-                    "estado_civil": normalize_estado_civil(row.get('estado_civil', '')),
-                    "papel_familiar": normalize_papel_familiar(row.get('papel_familiar', '')),
-                    "id_pai": str(row.get('id_pai', '')) if pd.notna(row.get('id_pai')) and str(row.get('id_pai')) != 'nan' else None,
-                    "id_mae": str(row.get('id_mae', '')) if pd.notna(row.get('id_mae')) and str(row.get('id_mae')) != 'nan' else None,
-                    "id_conjuge": str(row.get('id_conjugue', '')) if pd.notna(row.get('id_conjugue')) and str(row.get('id_conjugue')) != 'nan' else None,
-                    "coalizacao": bool(row.get('coalizacao', False)) if pd.notna(row.get('coalizacao')) else False,
-                    "menor": bool(row.get('menor', False)) if pd.notna(row.get('menor')) else False,
-                    "responsavel_primario": str(row.get('responsavel_primario', '')) if pd.notna(row.get('responsavel_primario')) and str(row.get('responsavel_primario')) != 'nan' else None,
-                    "responsavel_secundario": str(row.get('responsavel_secundario', '')) if pd.notna(row.get('responsavel_secundario')) and str(row.get('responsavel_secundario')) != 'nan' else None,
-                    
-                    # Campos booleanos de aptidão
-                    "chairman": bool(row.get('chairman', False)) if pd.notna(row.get('chairman')) else False,
-                    "pray": bool(row.get('pray', False)) if pd.notna(row.get('pray')) else False,
-                    "treasures": bool(row.get('treasures', False)) if pd.notna(row.get('treasures')) else False,
-                    "gems": bool(row.get('gems', False)) if pd.notna(row.get('gems')) else False,
-                    "reading": bool(row.get('reading', False)) if pd.notna(row.get('reading')) else False,
-                    "starting": bool(row.get('starting', False)) if pd.notna(row.get('starting')) else False,
-                    "following": bool(row.get('following', False)) if pd.notna(row.get('following')) else False,
-                    "making": bool(row.get('making', False)) if pd.notna(row.get('making')) else False,
-                    "explaining": bool(row.get('explaining', False)) if pd.notna(row.get('explaining')) else False,
-                    "talk": bool(row.get('talk', False)) if pd.notna(row.get('talk')) else False,
-                    
-                    # Data de nascimento
-                    "data_nascimento": normalize_date(row.get('data_nascimento'))
-                }
-                
-                # Remover campos None para economizar espaço
-                record = {k: v for k, v in record.items() if v is not None}
-                
-                records.append(record)
-                
-            except Exception as e:
-                print(f"Erro ao processar linha {index + 1}: {e}")
-                print(f"Dados da linha: {row.to_dict()}")
-                continue
+        # Converter as linhas em registros
+        if vectorized:
+            records = build_records_vectorized(df)
+        else:
+            records = build_records(df)
         
         # Salvar como JSON
-        with open(output_file_path, 'w', encoding='utf-8') as f:
-            json.dump(records, f, ensure_ascii=False, indent=2)
+        with open_output(output_file_path, compress) as f:
+            write_records(f, records, output_format)
         
         print(f"\nConversão concluída com sucesso!")
         print(f"Arquivo JSON salvo em: {output_file_path}")
@@ -101,113 +62,719 @@ def convert_excel_to_json(excel_file_path, output_file_path):
         print(f"Erro ao processar arquivo: {e}")
         return None
 
+def convert_excel_to_json_streaming(excel_file_path, output_file_path, chunk_size=DEFAULT_CHUNK_SIZE,
+                                    output_format='json', compress=False):
+    """
+    Converte o arquivo Excel para JSON lendo e gravando em blocos, sem manter
+    todos os registros na memória. Gera o mesmo arquivo de convert_excel_to_json
+    e retorna uma amostra com os dois primeiros registros
+    """
+    try:
+        print(f"Lendo arquivo Excel em blocos de {chunk_size} linhas: {excel_file_path}")
+        
+        amostra = []
+        
+        def registros():
+            for record in iter_records(excel_file_path, chunk_size):
+                if len(amostra) < 2:
+                    amostra.append(record)
+                yield record
+        
+        with open_output(output_file_path, compress) as f:
+            total = write_records(f, registros(), output_format)
+        
+        print(f"\nConversão concluída com sucesso!")
+        print(f"Arquivo JSON salvo em: {output_file_path}")
+        print(f"Total de registros processados: {total}")
+        
+        if amostra:
+            print(f"\nExemplo do primeiro registro:")
+            print(json.dumps(amostra[0], ensure_ascii=False, indent=2))
+        
+        return amostra
+        
+    except Exception as e:
+        print(f"Erro ao processar arquivo: {e}")
+        return None
+
+def convert_excel_to_json_delta(excel_file_path, output_file_path, manifest_path, use_cache=True):
+    """
+    Converte o arquivo Excel e grava só o que mudou desde o snapshot anterior
+    (inseridos, alterados e ids removidos), atualizando o manifesto em seguida
+    
+    Sem manifesto (primeira execução) todos os registros saem como inseridos.
+    Retorna a lista de registros para upsert
+    """
+    try:
+        print(f"Lendo arquivo Excel: {excel_file_path}")
+        df = read_excel_cached(excel_file_path, use_cache=use_cache)
+        if not {'id', 'user_id', 'email'} & set(df.columns):
+            print("O modo delta precisa de uma coluna 'id', 'user_id' ou 'email' para identificar os estudantes")
+            return None
+        records = build_records_vectorized(df, stable_ids=True)
+        
+        base_hashes = load_snapshot(manifest_path)
+        print(f"Snapshot anterior: {len(base_hashes)} registros ({manifest_path})")
+        inseridos, alterados, removidos, hashes = compute_delta(records, base_hashes)
+        
+        write_delta(output_file_path, inseridos, alterados, removidos, base=manifest_path)
+        write_manifest(manifest_path, hashes)
+        
+        print(f"\nDelta gerado com sucesso!")
+        print(f"Arquivo delta salvo em: {output_file_path}")
+        print(f"  - Inseridos: {len(inseridos)}")
+        print(f"  - Alterados: {len(alterados)}")
+        print(f"  - Removidos: {len(removidos)}")
+        print(f"Manifesto atualizado: {manifest_path}")
+        
+        return inseridos + alterados
+        
+    except Exception as e:
+        print(f"Erro ao gerar delta: {e}")
+        return None
+
+def convert_workbooks(input_pattern, output_file_path, workers=None, output_format='json', compress=False,
+                      use_cache=True):
+    """
+    Converte várias planilhas (uma por congregação, com uma ou mais abas) em
+    paralelo e grava um único JSON. Cada registro recebe congregacao_id com o
+    nome do arquivo da planilha (sem extensão)
+    
+    A leitura das abas é distribuída num pool de processos e os resultados são
+    juntados na ordem (arquivo, aba), então o resultado não depende do número
+    de processos. Os ids vêm do user_id/email (ou da planilha, aba e linha), então
+    duas execuções sobre as mesmas planilhas geram o mesmo JSON. Retorna uma amostra com os dois primeiros registros
+    """
+    try:
+        workbooks = list_workbooks(input_pattern)
+        if not workbooks:
+            print(f"Nenhuma planilha encontrada em: {input_pattern}")
+            return None
+        
+        tarefas = [(path, sheet, use_cache) for path in workbooks for sheet in list_sheets(path)]
+        print(f"Planilhas encontradas: {len(workbooks)} ({len(tarefas)} abas)")
+        
+        desconhecidos = {}
+        falhas_datas = []
+        amostra = []
+        
+        def registros(resultados):
+            for records, sheet_desconhecidos, sheet_falhas in resultados:
+                for campo, valores in sheet_desconhecidos.items():
+                    por_campo = desconhecidos.setdefault(campo, {})
+                    for valor, n in valores.items():
+                        por_campo[valor] = por_campo.get(valor, 0) + n
+                falhas_datas.extend(sheet_falhas)
+                for record in records:
+                    if len(amostra) < 2:
+                        amostra.append(record)
+                    yield record
+        
+        with open_output(output_file_path, compress) as f:
+            if workers == 1 or len(tarefas) == 1:
+                total = write_records(f, registros(map(_convert_sheet, tarefas)), output_format)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    total = write_records(f, registros(executor.map(_convert_sheet, tarefas)), output_format)
+        
+        report_unknown_values(desconhecidos)
+        report_date_failures(falhas_datas)
+        
+        print(f"\nConversão concluída com sucesso!")
+        print(f"Arquivo JSON salvo em: {output_file_path}")
+        print(f"Total de registros processados: {total}")
+        
+        return amostra
+        
+    except Exception as e:
+        print(f"Erro ao processar planilhas: {e}")
+        return None
+
+def list_workbooks(input_pattern):
+    """Lista, em ordem, as planilhas .xlsx de uma pasta ou de um padrão glob"""
+    if os.path.isdir(input_pattern):
+        input_pattern = os.path.join(input_pattern, '*.xlsx')
+    return sorted(
+        path for path in glob.glob(input_pattern)
+        if not os.path.basename(path).startswith('~$')  # arquivos temporários do Excel
+    )
+
+def list_sheets(excel_file_path):
+    """Nomes das abas da planilha, na ordem do arquivo"""
+    workbook = load_workbook(excel_file_path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+def _convert_sheet(tarefa):
+    """
+    Converte uma aba (executado nos processos do pool). Retorna os registros
+    com congregacao_id e os resumos de valores desconhecidos e datas inválidas
+    """
+    path, sheet, use_cache = tarefa
+    congregacao_id = os.path.splitext(os.path.basename(path))[0]
+    df = read_excel_cached(path, sheet_name=sheet, use_cache=use_cache)
+    
+    desconhecidos = {}
+    falhas_datas = []
+    # Ids estáveis (user_id/email, ou planilha/aba/linha), para que o JSON juntado seja o mesmo a cada execução
+    records = build_records_vectorized(df, desconhecidos, falhas_datas, stable_ids=True,
+                                       id_origem=f"{congregacao_id}/{sheet}")
+    for record in records:
+        record["congregacao_id"] = congregacao_id
+    # Identificar a planilha/aba nas datas inválidas
+    falhas_datas = [(f"{congregacao_id}/{sheet}: {campo}", indice, valor) for campo, indice, valor in falhas_datas]
+    return records, desconhecidos, falhas_datas
+
+def iter_record_chunks(excel_file_path, chunk_size=DEFAULT_CHUNK_SIZE, desconhecidos=None, falhas_datas=None):
+    """
+    Gera os registros normalizados em blocos de até chunk_size, lendo a planilha em streaming
+    (os resumos de valores desconhecidos e datas inválidas são únicos para a planilha toda)
+    """
+    imprimir_resumo = desconhecidos is None and falhas_datas is None
+    if desconhecidos is None:
+        desconhecidos = {}
+    if falhas_datas is None:
+        falhas_datas = []
+    for df in iter_excel_frames(excel_file_path, chunk_size):
+        yield build_records_vectorized(df, desconhecidos, falhas_datas)
+    if imprimir_resumo:
+        report_unknown_values(desconhecidos)
+        report_date_failures(falhas_datas)
+
+def iter_records(excel_file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Gera os registros normalizados um a um, para serem consumidos diretamente
+    (ex.: pelo carregamento em lotes no Supabase) sem arquivo intermediário
+    """
+    for records in iter_record_chunks(excel_file_path, chunk_size):
+        yield from records
+
+def open_output(output_file_path, compress=False):
+    """
+    Abre o arquivo de saída em texto UTF-8, comprimido com gzip se pedido
+    ou se o nome terminar em .gz
+    """
+    if compress or output_file_path.endswith('.gz'):
+        return gzip.open(output_file_path, 'wt', encoding='utf-8')
+    return open(output_file_path, 'w', encoding='utf-8')
+
+def write_records(f, records, output_format='json'):
+    """
+    Grava os registros à medida que são produzidos e retorna quantos foram gravados
+    
+    - json: mesmo resultado de json.dump(records, f, ensure_ascii=False, indent=2)
+    - ndjson: um registro compacto por linha (JSON Lines)
+    - compact: array JSON sem espaços
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Formato de saída inválido: {output_format}")
+    
+    total = 0
+    for record in records:
+        if output_format == 'json':
+            texto = json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            f.write(("[\n  " if total == 0 else ",\n  ") + texto)
+        else:
+            texto = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+            if output_format == 'ndjson':
+                f.write(texto + "\n")
+            else:
+                f.write(("[" if total == 0 else ",") + texto)
+        total += 1
+    
+    if output_format == 'json':
+        f.write("\n]" if total else "[]")
+    elif output_format == 'compact':
+        f.write("]" if total else "[]")
+    return total
+
+def build_records(df, falhas_datas=None):
+    """
+    Constrói os registros linha a linha (caminho original, via iterrows)
+    
+    As colunas de DATE_COLUMNS são normalizadas de uma vez por normalize_dates,
+    como em build_records_vectorized, para que os dois caminhos gerem as mesmas
+    datas; as inválidas são acumuladas em falhas_datas (ou mostradas ao final)
+    """
+    imprimir_resumo = falhas_datas is None
+    if falhas_datas is None:
+        falhas_datas = []
+    
+    # Datas normalizadas por coluna, indexadas pela posição da linha
+    datas = {
+        nome: normalize_dates(df[nome], nome, falhas_datas) if nome in df.columns else [None] * len(df)
+        for nome in DATE_COLUMNS
+    }
+    
+    # Lista para armazenar os registros convertidos
+    records = []
+    
+    # Processar cada linha
+    for posicao, (index, row) in enumerate(df.iterrows()):
+        try:
+            # Criar registro com mapeamento das colunas
+            record = {
+                # Campos obrigatórios
+                "id": str(row.get('id', gen_uuid())),
+                "nome": str(row.get('nome', '')).strip(),
+                
+                # Campos opcionais com valores padrão
+                "sobrenome": str(row.get('Sobrenome', '')).strip() if pd.notna(row.get('Sobrenome')) else None,
+                "idade": int(row.get('idade', 0)) if pd.notna(row.get('idade')) and row.get('idade') > 0 else None,
+                "genero": normalize_genero(row.get('genero', '')),
+                "email": str(row.get('email', '')).strip() if pd.notna(row.get('email')) else None,
+                "telefone": str(row.get('telefone', '')).strip() if pd.notna(row.get('telefone')) else None,
+                "data_batismo": datas['data_batismo'][posicao],
+                "data_de_matricula": datas['data_de_matricula'][posicao],
+                "servico": str(row.get('servico', '')).strip() if pd.notna(row.get('servico')) else None,
+                "cargo": normalize_cargo(row.get('cargo', '')),
+                "id_pai_mae": str(row.get('id_pai_mae', '')) if pd.notna(row.get('id_pai_mae')) and str(row.get('id_pai_mae')) != 'nan' else None,
+                "ativo": bool(row.get('ativo', True)) if pd.notna(row.get('ativo')) else True,
+                "observacoes": str(row.get('observacoes', '')).strip() if pd.notna(row.get('observacoes')) and str(row.get('observacoes')) != 'desconhecido' else None,
+                "estado_civil": normalize_estado_civil(row.get('estado_civil', '')),
+                "papel_familiar": normalize_papel_familiar(row.get('papel_familiar', '')),
+                "id_pai": str(row.get('id_pai', '')) if pd.notna(row.get('id_pai')) and str(row.get('id_pai')) != 'nan' else None,
+                "id_mae": str(row.get('id_mae', '')) if pd.notna(row.get('id_mae')) and str(row.get('id_mae')) != 'nan' else None,
+                "id_conjuge": str(row.get('id_conjugue', '')) if pd.notna(row.get('id_conjugue')) and str(row.get('id_conjugue')) != 'nan' else None,
+                "coalizacao": bool(row.get('coalizacao', False)) if pd.notna(row.get('coalizacao')) else False,
+                "menor": bool(row.get('menor', False)) if pd.notna(row.get('menor')) else False,
+                "responsavel_primario": str(row.get('responsavel_primario', '')) if pd.notna(row.get('responsavel_primario')) and str(row.get('responsavel_primario')) != 'nan' else None,
+                "responsavel_secundario": str(row.get('responsavel_secundario', '')) if pd.notna(row.get('responsavel_secundario')) and str(row.get('responsavel_secundario')) != 'nan' else None,
+                
+                # Campos booleanos de aptidão
+                "chairman": bool(row.get('chairman', False)) if pd.notna(row.get('chairman')) else False,
+                "pray": bool(row.get('pray', False)) if pd.notna(row.get('pray')) else False,
+                "treasures": bool(row.get('treasures', False)) if pd.notna(row.get('treasures')) else False,
+                "gems": bool(row.get('gems', False)) if pd.notna(row.get('gems')) else False,
+                "reading": bool(row.get('reading', False)) if pd.notna(row.get('reading')) else False,
+                "starting": bool(row.get('starting', False)) if pd.notna(row.get('starting')) else False,
+                "following": bool(row.get('following', False)) if pd.notna(row.get('following')) else False,
+                "making": bool(row.get('making', False)) if pd.notna(row.get('making')) else False,
+                "explaining": bool(row.get('explaining', False)) if pd.notna(row.get('explaining')) else False,
+                "talk": bool(row.get('talk', False)) if pd.notna(row.get('talk')) else False,
+                
+                # Data de nascimento
+                "data_nascimento": datas['data_nascimento'][posicao]
+            }
+            
+            # Remover campos None para economizar espaço
+            record = {k: v for k, v in record.items() if v is not None}
+            
+            records.append(record)
+            
+        except Exception as e:
+            print(f"Erro ao processar linha {index + 1}: {e}")
+            print(f"Dados da linha: {row.to_dict()}")
+            continue
+    
+    if imprimir_resumo:
+        report_date_failures(falhas_datas)
+    return records
+
+def build_records_vectorized(df, desconhecidos=None, falhas_datas=None, stable_ids=False, id_origem=None):
+    """
+    Constrói os mesmos registros de build_records aplicando cada mapeamento
+    sobre a coluna inteira; os dicts só são montados no final
+    
+    As datas passam por normalize_dates (formatos de DATE_FORMATS e seriais do
+    Excel), então textos como '05/06/2020' são lidos como DD/MM/AAAA.
+    Os valores categóricos desconhecidos e as datas inválidas são acumulados em
+    desconhecidos e falhas_datas; se não forem informados, os resumos são
+    mostrados ao final
+    
+    Com stable_ids=True o id vem de stable_student_ids (uuid5 do user_id ou do
+    email), para que o mesmo estudante tenha o mesmo id a cada execução e o
+    mesmo id do upload_estudantes --upsert (usado no modo delta); linhas sem
+    user_id nem email ficam com a coluna 'id', se houver.
+    Com id_origem (ex.: 'planilha/aba'), as linhas sem id, user_id nem email
+    recebem um id derivado de id_origem e do número da linha em vez de um uuid4
+    """
+    # idade não numérica (ex.: texto) gera erro por linha no caminho original
+    tipos_numericos = ('empty', 'integer', 'floating', 'mixed-integer-float', 'boolean')
+    if 'idade' in df.columns and pd.api.types.infer_dtype(df['idade'], skipna=True) not in tipos_numericos:
+        print("Coluna 'idade' não numérica, usando conversão linha a linha")
+        return build_records(df, falhas_datas)
+    
+    imprimir_resumo = desconhecidos is None and falhas_datas is None
+    if desconhecidos is None:
+        desconhecidos = {}
+    if falhas_datas is None:
+        falhas_datas = []
+    
+    def coluna(nome):
+        # Coluna ausente equivale a row.get() retornando None
+        if nome in df.columns:
+            return df[nome].astype(object)
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    
+    def texto(nome, strip=True, sentinela=None):
+        col = coluna(nome)
+        valores = col.map(str)
+        mascara = col.notna()
+        if sentinela is not None:
+            mascara &= valores != sentinela
+        if strip:
+            valores = valores.str.strip()
+        return valores.astype(object).where(mascara, None).tolist()
+    
+    def datas(nome):
+        # A coluna original mantém o tipo datetime64 quando o pandas já leu como data
+        valores = df[nome] if nome in df.columns else coluna(nome)
+        return normalize_dates(valores, nome, falhas_datas)
+    
+    def booleano(nome, padrao):
+        col = coluna(nome)
+        return col.where(col.notna(), padrao).astype(bool).tolist()
+    
+    # Campos obrigatórios
+    def novo_id(linha):
+        return gen_uuid() if id_origem is None else str(uuid.uuid5(IDS_NAMESPACE, f"{id_origem}:{linha}"))
+
+    ids_planilha = coluna('id').map(str).tolist() if 'id' in df.columns else None
+    if stable_ids and ('user_id' in df.columns or 'email' in df.columns):
+        reserva = novo_id if ids_planilha is None else (lambda linha: ids_planilha[linha])
+        ids, sem_chave = stable_student_ids(coluna('user_id'), coluna('email'), reserva)
+        if sem_chave and ids_planilha is None and id_origem is None:
+            print(f"⚠️  {sem_chave} linhas sem user_id nem email receberão um id novo a cada execução")
+    elif ids_planilha is not None:
+        ids = ids_planilha
+    else:
+        ids = [novo_id(linha) for linha in range(len(df))]
+    if 'nome' in df.columns:
+        nomes = coluna('nome').map(str).str.strip().tolist()
+    else:
+        nomes = [''] * len(df)
+    
+    idade = coluna('idade')
+    mascara_idade = idade.notna() & (pd.to_numeric(idade) > 0)
+    idades = pd.Series([None] * len(df), index=df.index, dtype=object)
+    idades[mascara_idade] = idade[mascara_idade].astype('int64').astype(object)
+    
+    colunas = {
+        # Campos obrigatórios
+        "id": ids,
+        "nome": nomes,
+        
+        # Campos opcionais com valores padrão
+        "sobrenome": texto('Sobrenome'),
+        "idade": idades.tolist(),
+        "genero": normalize_categorical(coluna('genero'), 'genero', desconhecidos),
+        "email": texto('email'),
+        "telefone": texto('telefone'),
+        "data_batismo": datas('data_batismo'),
+        "data_de_matricula": datas('data_de_matricula'),
+        "servico": texto('servico'),
+        "cargo": normalize_categorical(coluna('cargo'), 'cargo', desconhecidos),
+        "id_pai_mae": texto('id_pai_mae', strip=False, sentinela='nan'),
+        "ativo": booleano('ativo', True),
+        "observacoes": texto('observacoes', sentinela='desconhecido'),
+        "estado_civil": normalize_categorical(coluna('estado_civil'), 'estado_civil', desconhecidos),
+        "papel_familiar": normalize_categorical(coluna('papel_familiar'), 'papel_familiar', desconhecidos),
+        "id_pai": texto('id_pai', strip=False, sentinela='nan'),
+        "id_mae": texto('id_mae', strip=False, sentinela='nan'),
+        "id_conjuge": texto('id_conjugue', strip=False, sentinela='nan'),
+        "coalizacao": booleano('coalizacao', False),
+        "menor": booleano('menor', False),
+        "responsavel_primario": texto('responsavel_primario', strip=False, sentinela='nan'),
+        "responsavel_secundario": texto('responsavel_secundario', strip=False, sentinela='nan'),
+        
+        # Campos booleanos de aptidão
+        "chairman": booleano('chairman', False),
+        "pray": booleano('pray', False),
+        "treasures": booleano('treasures', False),
+        "gems": booleano('gems', False),
+        "reading": booleano('reading', False),
+        "starting": booleano('starting', False),
+        "following": booleano('following', False),
+        "making": booleano('making', False),
+        "explaining": booleano('explaining', False),
+        "talk": booleano('talk', False),
+        
+        # Data de nascimento
+        "data_nascimento": datas('data_nascimento')
+    }
+    
+    # Montar os dicts, removendo campos None para economizar espaço
+    chaves = list(colunas)
+    records = [
+        {k: v for k, v in zip(chaves, valores) if v is not None}
+        for valores in zip(*colunas.values())
+    ]
+    
+    if imprimir_resumo:
+        report_unknown_values(desconhecidos)
+        report_date_failures(falhas_datas)
+    return records
+
+# Namespace dos ids derivados da planilha/aba/linha (várias planilhas)
+IDS_NAMESPACE = uuid.UUID('0f3b8a52-6c1e-4d7a-9e25-8b4f1c6d2a90')
+
 def gen_uuid():
     """Gera um UUID único"""
     return str(uuid.uuid4())
 
+# Tabelas de normalização dos campos categóricos (montadas uma única vez)
+GENEROS_VALIDOS = {
+    'm': 'masculino',
+    'masculino': 'masculino',
+    'male': 'masculino',
+    'f': 'feminino',
+    'feminino': 'feminino',
+    'female': 'feminino'
+}
+
+CARGOS_VALIDOS = {
+    'anciao': 'anciao',
+    'servo_ministerial': 'servo_ministerial',
+    'pioneiro_regular': 'pioneiro_regular',
+    'publicador_batizado': 'publicador_batizado',
+    'publicador_nao_batizado': 'publicador_nao_batizado',
+    'estudante_novo': 'estudante_novo'
+}
+
+ESTADOS_CIVIS_VALIDOS = {
+    'solteiro': 'solteiro',
+    'casado': 'casado',
+    'viuvo': 'viuvo',
+    'desconhecido': 'desconhecido'
+}
+
+PAPEIS_FAMILIARES_VALIDOS = {
+    'pai': 'pai',
+    'mae': 'mae',
+    'filho': 'filho',
+    'filha': 'filha',
+    'filho_adulto': 'filho_adulto',
+    'filha_adulta': 'filha_adulta'
+}
+
+# Campo -> (tabela, valor para valores desconhecidos, valor para células vazias)
+CATEGORICAL_FIELDS = {
+    'genero': (GENEROS_VALIDOS, 'masculino', 'masculino'),
+    'cargo': (CARGOS_VALIDOS, 'estudante_novo', 'estudante_novo'),
+    'estado_civil': (ESTADOS_CIVIS_VALIDOS, 'desconhecido', 'desconhecido'),
+    'papel_familiar': (PAPEIS_FAMILIARES_VALIDOS, None, None),
+}
+
 def normalize_genero(genero):
     """Normaliza o campo gênero"""
     if pd.isna(genero):
         return 'masculino'  # valor padrão
     
-    genero_str = str(genero).lower().strip()
-    if genero_str in ['m', 'masculino', 'male']:
-        return 'masculino'
-    elif genero_str in ['f', 'feminino', 'female']:
-        return 'feminino'
-    else:
-        return 'masculino'  # valor padrão
+    return GENEROS_VALIDOS.get(str(genero).lower().strip(), 'masculino')
 
 def normalize_cargo(cargo):
     """Normaliza o campo cargo"""
     if pd.isna(cargo):
         return 'estudante_novo'  # valor padrão
     
-    cargo_str = str(cargo).lower().strip()
-    cargos_validos = {
-        'anciao': 'anciao',
-        'servo_ministerial': 'servo_ministerial',
-        'pioneiro_regular': 'pioneiro_regular',
-        'publicador_batizado': 'publicador_batizado',
-        'publicador_nao_batizado': 'publicador_nao_batizado',
-        'estudante_novo': 'estudante_novo'
-    }
-    
-    return cargos_validos.get(cargo_str, 'estudante_novo')
+    return CARGOS_VALIDOS.get(str(cargo).lower().strip(), 'estudante_novo')
 
 def normalize_estado_civil(estado):
     """Normaliza o campo estado civil"""
-    if pd.isna(estado) or str(estado).lower().strip() == 'desconhecido':
+    if pd.isna(estado):
         return 'desconhecido'
     
-    estado_str = str(estado).lower().strip()
-    estados_validos = {
-        'solteiro': 'solteiro',
-        'casado': 'casado',
-        'viuvo': 'viuvo',
-        'desconhecido': 'desconhecido'
-    }
-    
-    return estados_validos.get(estado_str, 'desconhecido')
+    return ESTADOS_CIVIS_VALIDOS.get(str(estado).lower().strip(), 'desconhecido')
 
 def normalize_papel_familiar(papel):
     """Normaliza o campo papel familiar"""
     if pd.isna(papel):
         return None
     
-    papel_str = str(papel).lower().strip()
-    papeis_validos = {
-        'pai': 'pai',
-        'mae': 'mae',
-        'filho': 'filho',
-        'filha': 'filha',
-        'filho_adulto': 'filho_adulto',
-        'filha_adulta': 'filha_adulta'
-    }
+    return PAPEIS_FAMILIARES_VALIDOS.get(str(papel).lower().strip(), None)
+
+def normalize_categorical(values, campo, desconhecidos=None):
+    """
+    Normaliza uma coluna inteira de um campo categórico (mesmo resultado das
+    funções normalize_*). Cada valor distinto é convertido uma única vez e o
+    resultado é espalhado pelos códigos de categoria das linhas
     
-    return papeis_validos.get(papel_str, None)
+    Se desconhecidos for um dict, acumula nele {campo: {valor: ocorrências}}
+    dos valores que não estão na tabela e receberam o valor padrão
+    """
+    tabela, padrao, vazio = CATEGORICAL_FIELDS[campo]
+    codigos, distintos = pd.factorize(pd.Series(values, dtype=object))
+    chaves = [str(v).lower().strip() for v in distintos]
+    
+    # Última posição = células vazias (código -1)
+    resultado = np.array([tabela.get(k, padrao) for k in chaves] + [vazio], dtype=object)
+    
+    if desconhecidos is not None:
+        ocorrencias = np.bincount(codigos[codigos >= 0], minlength=len(distintos))
+        for valor, chave, n in zip(distintos, chaves, ocorrencias):
+            if chave not in tabela:
+                por_campo = desconhecidos.setdefault(campo, {})
+                por_campo[str(valor)] = por_campo.get(str(valor), 0) + int(n)
+    
+    return resultado[codigos].tolist()
 
-def normalize_date(date_value):
-    """Normaliza campos de data"""
-    if pd.isna(date_value):
-        return None
+def report_unknown_values(desconhecidos):
+    """Mostra o resumo dos valores desconhecidos substituídos pelo padrão"""
+    if not desconhecidos:
+        return
+    print(f"\nValores desconhecidos substituídos pelo valor padrão:")
+    for campo, valores in desconhecidos.items():
+        padrao = CATEGORICAL_FIELDS[campo][1]
+        print(f"  - {campo} (-> {padrao}): " + ", ".join(
+            f"'{valor}' ({n})" for valor, n in sorted(valores.items(), key=lambda item: -item[1])
+        ))
+
+# Colunas de data tratadas pela etapa de datas
+DATE_COLUMNS = ('data_batismo', 'data_nascimento', 'data_de_matricula')
+
+# Formatos de texto aceitos, na ordem em que são tentados
+# (ISO e o DD/MM/AAAA descrito em docs/Oficial/FORMATO_PLANILHA.md)
+DATE_FORMATS = ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%d/%m/%Y', '%d/%m/%Y %H:%M:%S')
+
+# Números são lidos como datas seriais do Excel (dias desde 30/12/1899)
+EXCEL_EPOCH = '1899-12-30'
+EXCEL_SERIAL_MAX = 2958465  # 31/12/9999
+
+def normalize_dates(values, campo=None, falhas=None):
+    """
+    Normaliza uma coluna inteira de datas para 'AAAA-MM-DD' (None se vazia ou inválida)
     
-    try:
-        if isinstance(date_value, str):
-            # Tentar converter string para data
-            return pd.to_datetime(date_value).strftime('%Y-%m-%d')
-        elif isinstance(date_value, datetime):
-            # Já é datetime
-            return date_value.strftime('%Y-%m-%d')
-        else:
-            # Tentar converter outros tipos
-            return pd.to_datetime(date_value).strftime('%Y-%m-%d')
-    except:
-        return None
+    Tenta, em ordem e sempre sobre a coluna toda: valores que já são data/hora,
+    cada formato de DATE_FORMATS para textos e números como datas seriais do
+    Excel. As linhas que não se encaixam em nenhum são acumuladas em falhas
+    como (campo, índice, valor)
+    """
+    col = values if isinstance(values, pd.Series) else pd.Series(values)
+    
+    # Coluna já lida como data pelo pandas
+    if pd.api.types.is_datetime64_any_dtype(col):
+        texto = col.dt.strftime('%Y-%m-%d').astype(object)
+        return texto.where(col.notna(), None).tolist()
+    
+    col = col.astype(object)
+    resultado = pd.Series(None, index=col.index, dtype=object)
+    pendente = col.notna()
+    
+    def aplicar(convertidas):
+        # Grava as datas convertidas e tira essas linhas das pendentes
+        ok = convertidas.notna()
+        resultado[convertidas.index[ok]] = convertidas[ok].dt.strftime('%Y-%m-%d')
+        pendente[convertidas.index[ok]] = False
+        return convertidas[~ok]
+    
+    # 1. Valores que já são data/hora
+    eh_data = pendente & col.map(lambda v: isinstance(v, (datetime, date, np.datetime64)))
+    if eh_data.any():
+        aplicar(pd.to_datetime(col[eh_data], errors='coerce'))
+    
+    # 2. Textos, formato a formato (texto em branco conta como célula vazia)
+    eh_texto = pendente & col.map(lambda v: isinstance(v, str))
+    textos = col[eh_texto].str.strip()
+    pendente[textos.index[textos == '']] = False
+    textos = textos[textos != '']
+    for formato in DATE_FORMATS:
+        if textos.empty:
+            break
+        convertidas = pd.to_datetime(textos, format=formato, errors='coerce')
+        textos = textos[convertidas.isna()]
+        aplicar(convertidas)
+    
+    # 3. Números como datas seriais do Excel
+    eh_numero = pendente & col.map(
+        lambda v: isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, (bool, np.bool_))
+    )
+    if eh_numero.any():
+        seriais = col[eh_numero].astype(float)
+        seriais = seriais[(seriais >= 1) & (seriais <= EXCEL_SERIAL_MAX)]
+        aplicar(pd.to_datetime(seriais, unit='D', origin=EXCEL_EPOCH, errors='coerce'))
+    
+    if falhas is not None:
+        for indice, valor in col[pendente].items():
+            falhas.append((campo, indice, valor))
+    
+    return resultado.astype(object).where(resultado.notna(), None).tolist()
+
+def report_date_failures(falhas, limite=5):
+    """Mostra, de uma vez, as datas que não puderam ser interpretadas (com exemplos de linhas)"""
+    if not falhas:
+        return
+    por_campo = {}
+    for campo, indice, valor in falhas:
+        por_campo.setdefault(campo, []).append((indice, valor))
+    print(f"\nDatas inválidas (deixadas vazias): {len(falhas)}")
+    for campo, linhas in por_campo.items():
+        exemplos = ", ".join(f"linha {indice + 2}: '{valor}'" for indice, valor in linhas[:limite])
+        print(f"  - {campo}: {len(linhas)} (ex.: {exemplos})")
 
 def main():
     """Função principal"""
+    parser = argparse.ArgumentParser(description="Conversor de Excel para JSON - Sistema Ministerial")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="Converte aplicando os mapeamentos por coluna em vez de linha a linha")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Lê a planilha e grava o JSON em blocos, com memória limitada")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Linhas por bloco no modo --streaming (padrão: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default='json',
+                        help="Formato de saída: json (indentado), ndjson (JSON Lines) ou compact")
+    parser.add_argument("--gzip", action="store_true", help="Comprime a saída com gzip (.gz)")
+    parser.add_argument("--output", default=None,
+                        help="Arquivo JSON de saída (padrão: estudantes_refinados_converted.json, "
+                             "ou estudantes_refinados_delta.json com --delta)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignora o cache da planilha lida e relê o arquivo Excel")
+    parser.add_argument("--input", default="docs/Oficial/estudantes_ficticios_corrigido_modelo.xlsx",
+                        help="Planilha de entrada, ou uma pasta/padrão glob com várias planilhas (uma por congregação)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processos usados para ler várias planilhas (padrão: número de CPUs)")
+    parser.add_argument("--delta", action="store_true",
+                        help="Grava só os registros inseridos/alterados/removidos desde o último manifesto")
+    parser.add_argument("--manifest", default="estudantes_refinados_converted.manifest.json",
+                        help="Manifesto do snapshot anterior usado no modo --delta")
+    args = parser.parse_args()
+    
     print("Conversor de Excel para JSON - Sistema Ministerial")
     print("=" * 60)
     
     # Caminhos dos arquivos
-    excel_file = "docs/Oficial/estudantes_ficticios_corrigido_modelo.xlsx"
-    output_file = "estudantes_refinados_converted.json"
+    excel_file = args.input
+    output_file = args.output
+    if output_file is None:
+        output_file = "estudantes_refinados_delta.json" if args.delta else "estudantes_refinados_converted.json"
+    if args.gzip and not args.delta and not output_file.endswith('.gz'):
+        output_file += '.gz'
+    
+    # Pasta ou padrão glob: várias planilhas em paralelo
+    varias_planilhas = os.path.isdir(excel_file) or any(c in excel_file for c in "*?[")
     
     # Verificar se o arquivo Excel existe
-    if not os.path.exists(excel_file):
+    if not varias_planilhas and not os.path.exists(excel_file):
         print(f"Arquivo Excel não encontrado: {excel_file}")
         print("Verifique se o arquivo está no caminho correto")
         return
     
     # Converter Excel para JSON
-    records = convert_excel_to_json(excel_file, output_file)
+    if args.delta:
+        records = convert_excel_to_json_delta(excel_file, output_file, args.manifest,
+                                              use_cache=not args.no_cache)
+    elif varias_planilhas:
+        records = convert_workbooks(excel_file, output_file, workers=args.workers,
+                                    output_format=args.format, compress=args.gzip,
+                                    use_cache=not args.no_cache)
+    elif args.streaming:
+        records = convert_excel_to_json_streaming(excel_file, output_file, chunk_size=args.chunk_size,
+                                                  output_format=args.format, compress=args.gzip)
+    else:
+        records = convert_excel_to_json(excel_file, output_file, vectorized=args.vectorized,
+                                        output_format=args.format, compress=args.gzip,
+                                        use_cache=not args.no_cache)
     
     if records:
         print(f"\nPróximos passos:")
         print(f"1. Verifique o arquivo JSON gerado: {output_file}")
+        if args.delta:
+            print(f"   (envie só a lista 'upsert'; os ids em 'deleted' devem ser removidos à parte)")
         print(f"2. Use a função process_estudantes_batch no Supabase")
         print(f"3. Execute: SELECT process_estudantes_batch('SEU_JSON_AQUI'::JSONB);")
+        print(f"   Para listas grandes, divida em lotes: python estudantes_batches.py --input {output_file}")
         
         # Gerar comando SQL de exemplo
         print(f"\nComando SQL de exemplo:")
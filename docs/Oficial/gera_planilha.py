@@ -1,34 +1,28 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
 import pandas as pd
-import random
-import uuid
 from datetime import datetime
 
+# Módulos compartilhados ficam na raiz do repositório
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from planilha_cache import read_excel_cached
+from estudantes_familias import IndiceFamilias, vinculos_em_ciclo
+
 # Simple fake data without faker
 first_names_male = ['João', 'Pedro', 'Lucas', 'Mateus', 'Gabriel', 'Rafael', 'Thiago', 'Eduardo', 'André', 'Bruno']
 first_names_female = ['Ana', 'Maria', 'Beatriz', 'Camila', 'Carla', 'Fernanda', 'Juliana', 'Larissa', 'Luana', 'Patrícia']
 last_names = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes']
 
-def fake_name(genero='M'):
-    first = random.choice(first_names_male) if genero == 'M' else random.choice(first_names_female)
-    return f"{first} {random.choice(last_names)}"
-
-def fake_last_name():
-    return random.choice(last_names)
-
-def fake_phone():
-    return f"({random.randint(11,99)}) {random.randint(90000,99999)}-{random.randint(1000,9999)}"
-
-def fake_email(nome):
-    domains = ['gmail.com', 'hotmail.com', 'yahoo.com']
-    return f"{nome.lower().replace(' ', '.')}@{random.choice(domains)}"
+dominios_email = ['gmail.com', 'hotmail.com', 'yahoo.com']
 
 # 📂 Caminhos
 input_file = r"C:\Users\webbe\OneDrive\Documents\GitHub\ministry-hub-sync\docs\Oficial\estudantes_ficticios_corrigido_modelo.xlsx"
 output_file = r"C:\Users\webbe\OneDrive\Documents\GitHub\ministry-hub-sync\docs\Oficial\estudantes_corrigidos.xlsx"
 
-print(f"📂 Lendo planilha: {input_file}")
-df = pd.read_excel(input_file)
-
 # 📌 Lista de colunas obrigatórias
 colunas_necessarias = [
     "family_id", "user_id", "nome", "familia", "idade", "genero",
@@ -41,22 +35,9 @@ colunas_necessarias = [
     "data_nascimento", "data_de_matricula"
 ]
 
-# Garantir que todas existam
-for col in colunas_necessarias:
-    if col not in df.columns:
-        if col == "idade":
-            df[col] = 0
-        elif col in ["ativo", "menor", "chairman", "pray", "tresures", "gems",
-                     "reading", "starting", "following", "making", "explaining", "talk"]:
-            df[col] = False
-        else:
-            df[col] = None
-
-# Garantir tipos booleanos nas colunas de participação
+# Colunas de participação
 particip_cols = ["chairman", "pray", "tresures", "gems",
                  "reading", "starting", "following", "making", "explaining", "talk"]
-for col in particip_cols:
-    df[col] = df[col].astype(bool)
 
 ANO_ATUAL = datetime.now().year
 
@@ -74,313 +55,456 @@ regras_participacoes = {
     "estudante_nova":          [False, False, False, False, False, True, True, True, True, False],
 }
 
-# 🚀 Correções linha a linha
-for idx, row in df.iterrows():
-    cargo = str(row["cargo"]).strip().lower() if pd.notna(row["cargo"]) else "estudante_novo"
-
-    # Nome completo obrigatório e >=2 chars
-    if pd.isna(row["nome"]) or len(str(row["nome"]).strip()) < 2:
-        genero_row = str(row["genero"]).upper() if not pd.isna(row["genero"]) else 'M'
-        df.at[idx, "nome"] = fake_name(genero_row)
+# 📌 Cargos por gênero e cargos sem batismo (matrícula em vez de data_batismo)
+cargos_masculinos = ["anciao", "servo_ministerial", "pioneiro_regular", "publicador_batizado", "publicador_nao_batizado", "estudante_novo"]
+cargos_femininos = ["pioneira_regular", "publicadora_batizada", "publicadora_nao_batizada", "estudante_nova"]
+cargos_nao_batizados = ["estudante_novo", "estudante_nova", "publicador_nao_batizado", "publicadora_nao_batizada"]
+cargos_batizados = [cargo for cargo in cargos_masculinos + cargos_femininos if cargo not in cargos_nao_batizados]
+
+# 📌 Matriz cargo × participação (linha = código do cargo, coluna = particip_cols),
+# usada na correção e na validação. tresures/gems só para ancião e servo ministerial
+cargos_designados = ["anciao", "servo_ministerial"]
+cargos_participacao = list(regras_participacoes)
+matriz_participacoes = np.array([regras_participacoes[cargo] for cargo in cargos_participacao], dtype=bool)
+matriz_participacoes[np.ix_(~np.isin(cargos_participacao, cargos_designados),
+                            [particip_cols.index("tresures"), particip_cols.index("gems")])] = False
+
+def codigos_cargo(cargo):
+    """Código de cada cargo normalizado (linha da matriz_participacoes); -1 se desconhecido"""
+    return pd.Categorical(cargo, categories=cargos_participacao).codes.astype(int)
+
+def participacoes_permitidas(cargo):
+    """Linhas da matriz_participacoes dos cargos normalizados; cargo desconhecido não tem participações"""
+    codigo = codigos_cargo(cargo)
+    return np.where((codigo >= 0)[:, None], matriz_participacoes[codigo], False)
+
+def datas_aleatorias(rng, anos):
+    """Datas 'AAAA-MM-DD' nos anos dados, com mês e dia (até 28) sorteados"""
+    anos = np.asarray(anos, dtype=int)
+    meses = rng.integers(1, 13, len(anos))
+    dias = rng.integers(1, 29, len(anos))
+    primeiro_dia = ((anos - 1970) * 12 + meses - 1).astype("datetime64[M]").astype("datetime64[D]")
+    return (primeiro_dia + (dias - 1)).astype(str)
+
+def uuids_aleatorios(rng, quantidade):
+    """UUIDs v4 (texto) a partir de um único sorteio de 16 bytes por id"""
+    dados = np.frombuffer(rng.bytes(16 * quantidade), dtype=np.uint8).reshape(quantidade, 16).copy()
+    dados[:, 6] = (dados[:, 6] & 0x0F) | 0x40
+    dados[:, 8] = (dados[:, 8] & 0x3F) | 0x80
+    texto = pd.Series(np.frombuffer(dados.tobytes().hex().encode(), dtype="S32").astype(str), dtype=str)
+    return (texto.str[0:8] + "-" + texto.str[8:12] + "-" + texto.str[12:16] + "-"
+            + texto.str[16:20] + "-" + texto.str[20:32]).to_numpy()
+
+def vazio(serie):
+    """Valores ausentes ou só com espaços"""
+    return serie.isna() | serie.astype(str).str.strip().eq("")
+
+def aplicar_regras_s38(df, rng):
+    """
+    Correções S-38 aplicadas coluna a coluna: cada regra monta a máscara das
+    linhas afetadas e sorteia de uma vez, com rng, os valores de todas elas.
+    O cargo final (gênero compatível) é definido antes das regras de batismo,
+    matrícula e tempo, que usam esse cargo (vazio = estudante_novo)
+    """
+    cargo = df["cargo"].astype(str).str.strip().str.lower().where(df["cargo"].notna(), "estudante_novo")
+
+    # Nome completo obrigatório e >=2 chars (nome fictício pelo gênero informado)
+    sem_nome = df["nome"].isna() | (df["nome"].astype(str).str.strip().str.len() < 2)
+    if sem_nome.any():
+        masculino = (df.loc[sem_nome, "genero"].astype(str).str.upper().eq("M") | df.loc[sem_nome, "genero"].isna()).to_numpy()
+        primeiros = np.where(masculino, rng.choice(first_names_male, len(masculino)),
+                             rng.choice(first_names_female, len(masculino)))
+        df.loc[sem_nome, "nome"] = [f"{primeiro} {sobrenome}" for primeiro, sobrenome in
+                                    zip(primeiros, rng.choice(last_names, len(masculino)))]
 
     # Família obrigatória
-    if pd.isna(row["familia"]) or str(row["familia"]).strip() == "":
-        df.at[idx, "familia"] = fake_last_name()
-
-    # Gênero M ou F (capitalizado)
-    if pd.isna(row["genero"]) or str(row["genero"]).upper() not in ["M", "F"]:
-        df.at[idx, "genero"] = random.choice(["M", "F"])
+    sem_familia = vazio(df["familia"])
+    df.loc[sem_familia, "familia"] = rng.choice(last_names, sem_familia.sum())
+
+    # Gênero M ou F (capitalizado); ancião e servo ministerial são sempre M
+    genero = df["genero"].astype(str).str.upper().where(df["genero"].notna(), "")
+    genero_invalido = ~genero.isin(["M", "F"])
+    genero[genero_invalido] = rng.choice(["M", "F"], genero_invalido.sum())
+    genero[cargo.isin(cargos_designados)] = "M"
+
+    # 🔹 Gênero compatível com cargo (ajustar cargo se necessário): daqui em diante o cargo é o final
+    for cargos_genero, letra in ((cargos_femininos, "F"), (cargos_masculinos, "M")):
+        cargo_invalido = (genero == letra) & ~cargo.isin(cargos_genero)
+        novos = rng.choice(cargos_genero, cargo_invalido.sum())
+        df.loc[cargo_invalido, "cargo"] = novos
+        cargo[cargo_invalido] = novos
 
     # Idade
-    try:
-        idade = int(row["idade"])
-        if idade < 1 or idade > 120:
-            raise ValueError
-    except:
-        idade = random.randint(5, 90)
-        df.at[idx, "idade"] = idade
+    idade = np.trunc(pd.to_numeric(df["idade"], errors="coerce"))
+    idade_invalida = idade.isna() | (idade < 1) | (idade > 120)
+    idade[idade_invalida] = rng.integers(5, 91, idade_invalida.sum())
+    idade = idade.astype(int)
 
     # Data de nascimento coerente com idade
-    try:
-        nascimento = pd.to_datetime(row["data_nascimento"], errors="coerce")
-        if pd.isna(nascimento):
-            raise ValueError
-    except:
-        nascimento = datetime(ANO_ATUAL - idade, random.randint(1, 12), random.randint(1, 28))
-        df.at[idx, "data_nascimento"] = nascimento.strftime("%Y-%m-%d")
-
-    # Menor baseado em idade
-    df.at[idx, "menor"] = idade < 18
-
-    # Responsável para menores (primário obrigatório, secundário opcional)
-    if df.at[idx, "menor"]:
-        if pd.isna(row["responsavel_primario"]) or str(row["responsavel_primario"]).strip() == "":
-            df.at[idx, "responsavel_primario"] = str(uuid.uuid4())
-        if pd.isna(row["responsavel_secundario"]) or str(row["responsavel_secundario"]).strip() == "":
-            df.at[idx, "responsavel_secundario"] = str(uuid.uuid4()) if random.random() > 0.5 else ""
+    nascimento = pd.to_datetime(df["data_nascimento"], errors="coerce", format="mixed")
+    sem_nascimento = nascimento.isna()
+    if sem_nascimento.any():
+        df.loc[sem_nascimento, "data_nascimento"] = datas_aleatorias(rng, ANO_ATUAL - idade[sem_nascimento])
+        nascimento[sem_nascimento] = pd.to_datetime(df.loc[sem_nascimento, "data_nascimento"])
+    ano_nascimento = nascimento.dt.year.astype(int)
 
     # 🔹 Estudantes/Não batizados → matrícula obrigatória, sem batismo
-    if cargo in ["estudante_novo", "estudante_nova", "publicador_nao_batizado", "publicadora_nao_batizada"]:
-        df.at[idx, "data_batismo"] = None
-        min_ano = int(nascimento.year) + 10
-        max_ano = ANO_ATUAL
-        if min_ano > max_ano:
-            # Adjust age down to make possible (young student)
-            new_idade = random.randint(1, 9)  # Ensure +10 <= current
-            nascimento = datetime(ANO_ATUAL - new_idade, random.randint(1, 12), random.randint(1, 28))
-            df.at[idx, "idade"] = new_idade
-            df.at[idx, "data_nascimento"] = nascimento.strftime("%Y-%m-%d")
-            min_ano = int(nascimento.year) + 10
-        ano_matricula = random.randint(min_ano, max_ano)
-        data_matricula = datetime(ano_matricula, random.randint(1, 12), random.randint(1, 28))
-        df.at[idx, "data_de_matricula"] = data_matricula.strftime("%Y-%m-%d")
-        ref_date_str = df.at[idx, "data_de_matricula"]
-    else:
-        # 🔹 Batizados → batismo obrigatório ≥10 anos após nascimento
-        try:
-            batismo = pd.to_datetime(row["data_batismo"], errors="coerce")
-            if pd.isna(batismo) or batismo.year < nascimento.year + 10:
-                raise ValueError
-        except:
-            min_ano = int(nascimento.year) + 10
-            max_ano = ANO_ATUAL - 1
-            if min_ano > max_ano:
-                # Adjust age up to make possible (older person)
-                new_idade = random.randint(11, 90)
-                nascimento = datetime(ANO_ATUAL - new_idade, random.randint(1, 12), random.randint(1, 28))
-                df.at[idx, "idade"] = new_idade
-                df.at[idx, "data_nascimento"] = nascimento.strftime("%Y-%m-%d")
-                min_ano = int(nascimento.year) + 10
-            ano_batismo = random.randint(min_ano, max_ano)
-            batismo = datetime(ano_batismo, random.randint(1, 12), random.randint(1, 28))
-            df.at[idx, "data_batismo"] = batismo.strftime("%Y-%m-%d")
-        df.at[idx, "data_de_matricula"] = df.at[idx, "data_batismo"]
-        ref_date_str = df.at[idx, "data_batismo"]
+    # (nascidos há menos de 10 anos ficam com matrícula no ano atual)
+    nao_batizado = cargo.isin(cargos_nao_batizados)
+    ano_referencia = pd.Series(0, index=df.index)
+    df.loc[nao_batizado, "data_batismo"] = None
+    ano_matricula = rng.integers(np.minimum(ano_nascimento[nao_batizado] + 10, ANO_ATUAL), ANO_ATUAL + 1)
+    df.loc[nao_batizado, "data_de_matricula"] = datas_aleatorias(rng, ano_matricula)
+    ano_referencia[nao_batizado] = ano_matricula
+
+    # 🔹 Batizados → batismo obrigatório ≥10 anos após nascimento
+    batismo = pd.to_datetime(df["data_batismo"], errors="coerce", format="mixed")
+    batismo_invalido = ~nao_batizado & (batismo.isna() | (batismo.dt.year < ano_nascimento + 10))
+    # Quem é novo demais para o batismo fica mais velho (idade 11 a 90)
+    sem_espaco = batismo_invalido & (ano_nascimento + 10 > ANO_ATUAL - 1)
+    if sem_espaco.any():
+        idade[sem_espaco] = rng.integers(11, 91, sem_espaco.sum())
+        df.loc[sem_espaco, "data_nascimento"] = datas_aleatorias(rng, ANO_ATUAL - idade[sem_espaco])
+        ano_nascimento[sem_espaco] = pd.to_datetime(df.loc[sem_espaco, "data_nascimento"]).dt.year
+    ano_batismo = rng.integers(ano_nascimento[batismo_invalido] + 10, ANO_ATUAL)
+    df.loc[batismo_invalido, "data_batismo"] = datas_aleatorias(rng, ano_batismo)
+    df.loc[~nao_batizado, "data_de_matricula"] = df.loc[~nao_batizado, "data_batismo"]
+    ano_referencia[~nao_batizado] = batismo.dt.year
+    ano_referencia[batismo_invalido] = ano_batismo
 
     # 🔹 Tempo (anos desde referência)
-    if pd.notna(ref_date_str):
-        ref_date = pd.to_datetime(ref_date_str, errors="coerce")
-        df.at[idx, "tempo"] = int(ANO_ATUAL - ref_date.year) if pd.notna(ref_date) else 0
-    else:
-        df.at[idx, "tempo"] = 0
-
-    anos_batismo = int(df.at[idx, "tempo"])
-
-    # 📌 Regras específicas de cargo
-    if cargo == "anciao":
-        if df.at[idx, "idade"] < 21:
-            df.at[idx, "idade"] = random.randint(21, 80)
-            # Recalcular nascimento e ref_date se idade mudou
-            nascimento = datetime(ANO_ATUAL - df.at[idx, "idade"], random.randint(1, 12), random.randint(1, 28))
-            df.at[idx, "data_nascimento"] = nascimento.strftime("%Y-%m-%d")
-        if anos_batismo < 4:
-            df.at[idx, "data_batismo"] = datetime(ANO_ATUAL - 4, random.randint(1, 12), random.randint(1, 28)).strftime("%Y-%m-%d")
-            df.at[idx, "data_de_matricula"] = df.at[idx, "data_batismo"]
-            # Recalcular tempo
-            ref_date = pd.to_datetime(df.at[idx, "data_batismo"])
-            df.at[idx, "tempo"] = int(ANO_ATUAL - ref_date.year)
-        df.at[idx, "genero"] = "M"
-
-    elif cargo == "servo_ministerial":
-        if df.at[idx, "idade"] < 16:
-            df.at[idx, "idade"] = random.randint(16, 80)
-            nascimento = datetime(ANO_ATUAL - df.at[idx, "idade"], random.randint(1, 12), random.randint(1, 28))
-            df.at[idx, "data_nascimento"] = nascimento.strftime("%Y-%m-%d")
-        if anos_batismo < 2:
-            df.at[idx, "data_batismo"] = datetime(ANO_ATUAL - 2, random.randint(1, 12), random.randint(1, 28)).strftime("%Y-%m-%d")
-            df.at[idx, "data_de_matricula"] = df.at[idx, "data_batismo"]
-            ref_date = pd.to_datetime(df.at[idx, "data_batismo"])
-            df.at[idx, "tempo"] = int(ANO_ATUAL - ref_date.year)
-        df.at[idx, "genero"] = "M"
-
-    elif cargo in ("pioneiro_regular", "pioneira_regular"):
-        if anos_batismo < 1:
-            df.at[idx, "data_batismo"] = datetime(ANO_ATUAL - 1, random.randint(1, 12), random.randint(1, 28)).strftime("%Y-%m-%d")
-            df.at[idx, "data_de_matricula"] = df.at[idx, "data_batismo"]
-            ref_date = pd.to_datetime(df.at[idx, "data_batismo"])
-            df.at[idx, "tempo"] = int(ANO_ATUAL - ref_date.year)
-
-    # 🔹 Gênero compatível com cargo (ajustar cargo se necessário)
-    genero = str(df.at[idx, "genero"]).upper()
-    cargos_masculinos = ["anciao", "servo_ministerial", "pioneiro_regular", "publicador_batizado", "publicador_nao_batizado", "estudante_novo"]
-    cargos_femininos = ["pioneira_regular", "publicadora_batizada", "publicadora_nao_batizada", "estudante_nova"]
-    if genero == "F" and cargo.lower() not in [c.lower() for c in cargos_femininos]:
-        df.at[idx, "cargo"] = random.choice(cargos_femininos)
-    elif genero == "M" and cargo.lower() not in [c.lower() for c in cargos_masculinos]:
-        df.at[idx, "cargo"] = random.choice(cargos_masculinos)
+    tempo = (ANO_ATUAL - ano_referencia).astype(int)
+
+    # 📌 Regras específicas de cargo: idade mínima e anos mínimos de batismo
+    for cargos, idade_minima, anos_minimos in (
+        (["anciao"], 21, 4),
+        (["servo_ministerial"], 16, 2),
+        (["pioneiro_regular", "pioneira_regular"], None, 1),
+    ):
+        do_cargo = cargo.isin(cargos)
+        if idade_minima is not None:
+            jovem = do_cargo & (idade < idade_minima)
+            idade[jovem] = rng.integers(idade_minima, 81, jovem.sum())
+            df.loc[jovem, "data_nascimento"] = datas_aleatorias(rng, ANO_ATUAL - idade[jovem])
+        pouco_tempo = do_cargo & (tempo < anos_minimos)
+        datas_batismo = datas_aleatorias(rng, np.full(pouco_tempo.sum(), ANO_ATUAL - anos_minimos))
+        df.loc[pouco_tempo, "data_batismo"] = datas_batismo
+        df.loc[pouco_tempo, "data_de_matricula"] = datas_batismo
+        tempo[pouco_tempo] = anos_minimos
+
+    df["idade"] = idade
+    df["genero"] = genero
+    df["tempo"] = tempo
+
+    # Menor baseado na idade final
+    menor = idade < 18
+    df["menor"] = menor
+
+    # Responsável para menores (primário obrigatório, secundário opcional)
+    sem_primario = menor & vazio(df["responsavel_primario"])
+    df.loc[sem_primario, "responsavel_primario"] = uuids_aleatorios(rng, sem_primario.sum())
+    sem_secundario = menor & vazio(df["responsavel_secundario"])
+    sorteados = rng.random(sem_secundario.sum()) > 0.5
+    df.loc[sem_secundario, "responsavel_secundario"] = [responsavel if sorteado else "" for responsavel, sorteado in
+                                                        zip(uuids_aleatorios(rng, len(sorteados)), sorteados)]
 
     # 🔹 Estado civil = solteiro se menor
-    if df.at[idx, "idade"] < 18:
-        df.at[idx, "estado_civil"] = "solteiro"
-
-    # 🔹 Participações (com override para tresures/gems)
-    cargo_corrigido = str(df.at[idx, "cargo"]).strip().lower()
-    if cargo_corrigido in regras_participacoes:
-        for col, val in zip(particip_cols, regras_participacoes[cargo_corrigido]):
-            if col in ["tresures", "gems"] and cargo_corrigido not in ["anciao", "servo_ministerial"]:
-                df.at[idx, col] = False
+    df.loc[menor, "estado_civil"] = "solteiro"
+
+    # 🔹 Participações pela matriz cargo × participação
+    codigo = codigos_cargo(cargo)
+    conhecido = codigo >= 0
+    df.loc[conhecido, particip_cols] = matriz_participacoes[codigo[conhecido]]
+    return df
+
+# 📌 Diferença mínima de idade entre pai/mãe e filho (o ajuste sorteia de 16 a 30 anos)
+DIFERENCA_MINIMA_PAIS = 16
+DIFERENCA_MAXIMA_PAIS = 30
+IDADE_MAXIMA = 120
+
+def reconciliar_idades_familia(df, rng):
+    """
+    Garante que pai e mãe (id_pai/id_mae → user_id) tenham pelo menos 16 anos a
+    mais que o filho. O índice user_id → linha é montado uma vez e os vínculos
+    são conferidos todos juntos; cada rodada ajusta a idade de quem ficou novo
+    demais para o filho mais velho, até nenhum vínculo mudar (avós entram em
+    cascata). Vínculos em ciclo ficam de fora. Retorna {"rodadas", "ajustados",
+    "em_ciclo", "sem_solucao"}
+    """
+    filhos, pais = IndiceFamilias(df).vinculos_pais()
+
+    em_ciclo = vinculos_em_ciclo(len(df), filhos, pais)
+    filhos, pais = filhos[~em_ciclo], pais[~em_ciclo]
+
+    idade = df["idade"].to_numpy(dtype=int).copy()
+    ajustados = np.zeros(len(df), dtype=bool)
+    rodadas = 0
+    while True:
+        # A idade exigida de cada pai/mãe é a do filho mais velho + 16; sem solução acima de 120
+        novo_demais = idade[pais] - idade[filhos] < DIFERENCA_MINIMA_PAIS
+        exigida = np.full(len(df), -1)
+        np.maximum.at(exigida, pais[novo_demais], idade[filhos[novo_demais]])
+        alvo = np.flatnonzero((exigida >= 0) & (exigida + DIFERENCA_MINIMA_PAIS <= IDADE_MAXIMA))
+        if len(alvo) == 0:
+            break
+        rodadas += 1
+        sorteio = rng.integers(DIFERENCA_MINIMA_PAIS, DIFERENCA_MAXIMA_PAIS + 1, len(alvo))
+        idade[alvo] = np.minimum(exigida[alvo] + sorteio, IDADE_MAXIMA)
+        ajustados[alvo] = True
+
+    if ajustados.any():
+        df["idade"] = idade
+        # Recalcular nascimento de quem teve a idade ajustada
+        df.loc[ajustados, "data_nascimento"] = datas_aleatorias(rng, ANO_ATUAL - idade[ajustados])
+    return {"rodadas": rodadas, "ajustados": int(ajustados.sum()), "em_ciclo": int(em_ciclo.sum()),
+            "sem_solucao": int(novo_demais.sum())}
+
+def preencher_opcionais(df, rng):
+    """
+    Preenche as colunas opcionais vazias: as máscaras de nulos são montadas uma
+    vez por coluna e os valores sorteados de uma vez com rng; created_at e
+    updated_at recebem o mesmo horário da execução. Retorna {coluna: células
+    preenchidas} das colunas que tinham vazios
+    """
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    constante = lambda valor: lambda nulo: np.full(nulo.sum(), valor, dtype=object)
+    sorteio = lambda opcoes: lambda nulo: rng.choice(np.array(opcoes, dtype=object), nulo.sum())
+
+    def emails(nulo):
+        nomes = df.loc[nulo, "nome"].astype(str).str.split().str[0].str.lower()
+        return (nomes + "@" + rng.choice(dominios_email, len(nomes))).to_numpy(dtype=object)
+
+    def telefones(nulo):
+        n = nulo.sum()
+        ddd, numero, final = rng.integers(11, 100, n), rng.integers(90000, 100000, n), rng.integers(1000, 10000, n)
+        return np.array([f"({a}) {b}-{c}" for a, b, c in zip(ddd, numero, final)], dtype=object)
+
+    geradores = {
+        "email": emails,
+        "telefone": telefones,
+        "ativo": constante(True),
+        "observacoes": constante(""),
+        "created_at": constante(agora),
+        "updated_at": constante(agora),
+        "estado_civil": sorteio(["solteiro", "casado", "viúvo"]),
+        "papel_familiar": sorteio(["pai", "mãe", "filho", "filha", "avo"]),
+        "id_pai": constante(""),
+        "id_mae": constante(""),
+        "id_conjuge": constante(""),
+        "coabitacao": sorteio([True, False]),
+        "family_id": lambda nulo: uuids_aleatorios(rng, nulo.sum()),
+        "user_id": lambda nulo: uuids_aleatorios(rng, nulo.sum()),
+    }
+    preenchidos = {}
+    for col, gerar in geradores.items():
+        nulo = df[col].isna().to_numpy()
+        if not nulo.any():
+            continue
+        valores = np.empty(len(df), dtype=object)
+        valores[nulo] = gerar(nulo)
+        df[col] = df[col].mask(nulo, valores)
+        preenchidos[col] = int(nulo.sum())
+    return preenchidos
+
+def corrigir_planilha(df, seed=None):
+    """
+    Aplica as correções S-38 e retorna a planilha corrigida. Com seed, as
+    correções das regras S-38 são reproduzíveis para a mesma planilha
+    """
+    rng = np.random.default_rng(seed)
+
+    # Garantir que todas existam
+    for col in colunas_necessarias:
+        if col not in df.columns:
+            if col == "idade":
+                df[col] = 0
+            elif col in ["ativo", "menor", "chairman", "pray", "tresures", "gems",
+                         "reading", "starting", "following", "making", "explaining", "talk"]:
+                df[col] = False
             else:
-                df.at[idx, col] = bool(val)
-
-# 📌 Ajuste pais/filhos (mínimo 16 anos de diferença) - rodar após todas as idades
-for idx, row in df.iterrows():
-    if pd.notna(row["id_pai"]) and str(row["id_pai"]).strip() != "":
-        pai_mask = df["user_id"] == row["id_pai"]
-        if pai_mask.any():
-            pai_idx = df[pai_mask].index[0]
-            idade_pai = int(df.at[pai_idx, "idade"])
-            if idade_pai - int(row["idade"]) < 16:
-                df.at[pai_idx, "idade"] = int(row["idade"]) + random.randint(16, 30)
-                # Recalcular nascimento do pai
-                nascimento_pai = datetime(ANO_ATUAL - df.at[pai_idx, "idade"], random.randint(1, 12), random.randint(1, 28))
-                df.at[pai_idx, "data_nascimento"] = nascimento_pai.strftime("%Y-%m-%d")
-    if pd.notna(row["id_mae"]) and str(row["id_mae"]).strip() != "":
-        mae_mask = df["user_id"] == row["id_mae"]
-        if mae_mask.any():
-            mae_idx = df[mae_mask].index[0]
-            idade_mae = int(df.at[mae_idx, "idade"])
-            if idade_mae - int(row["idade"]) < 16:
-                df.at[mae_idx, "idade"] = int(row["idade"]) + random.randint(16, 30)
-                nascimento_mae = datetime(ANO_ATUAL - df.at[mae_idx, "idade"], random.randint(1, 12), random.randint(1, 28))
-                df.at[mae_idx, "data_nascimento"] = nascimento_mae.strftime("%Y-%m-%d")
-
-# Preencher colunas opcionais se vazias
-for idx in df.index:
-    if pd.isna(df.at[idx, "email"]):
-        nome = str(df.at[idx, "nome"]).split()[0].lower()
-        df.at[idx, "email"] = fake_email(nome)
-    if pd.isna(df.at[idx, "telefone"]):
-        df.at[idx, "telefone"] = fake_phone()
-    if pd.isna(df.at[idx, "ativo"]):
-        df.at[idx, "ativo"] = True
-    if pd.isna(df.at[idx, "observacoes"]):
-        df.at[idx, "observacoes"] = ""
-    if pd.isna(df.at[idx, "created_at"]):
-        df.at[idx, "created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    if pd.isna(df.at[idx, "updated_at"]):
-        df.at[idx, "updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    if pd.isna(df.at[idx, "estado_civil"]):
-        df.at[idx, "estado_civil"] = random.choice(["solteiro", "casado", "viúvo"])
-    if pd.isna(df.at[idx, "papel_familiar"]):
-        df.at[idx, "papel_familiar"] = random.choice(["pai", "mãe", "filho", "filha", "avo"])
-    if pd.isna(df.at[idx, "id_pai"]):
-        df.at[idx, "id_pai"] = ""
-    if pd.isna(df.at[idx, "id_mae"]):
-        df.at[idx, "id_mae"] = ""
-    if pd.isna(df.at[idx, "id_conjuge"]):
-        df.at[idx, "id_conjuge"] = ""
-    if pd.isna(df.at[idx, "coabitacao"]):
-        df.at[idx, "coabitacao"] = random.choice([True, False])
-    if pd.isna(df.at[idx, "family_id"]):
-        df.at[idx, "family_id"] = str(uuid.uuid4())
-    if pd.isna(df.at[idx, "user_id"]):
-        df.at[idx, "user_id"] = str(uuid.uuid4())
+                df[col] = None
+
+    # Garantir tipos booleanos nas colunas de participação
+    for col in particip_cols:
+        df[col] = df[col].astype(bool)
+
+    aplicar_regras_s38(df, rng)
+
+    # 📌 Ajuste pais/filhos (mínimo 16 anos de diferença) - rodar após todas as idades
+    familia = reconciliar_idades_familia(df, rng)
+    print(f"👪 Pais/mães com idade ajustada: {familia['ajustados']} ({familia['rodadas']} rodadas)")
+    if familia["em_ciclo"]:
+        print(f"⚠️  {familia['em_ciclo']} vínculos pai/mãe em ciclo não foram ajustados")
+    if familia["sem_solucao"]:
+        print(f"⚠️  {familia['sem_solucao']} vínculos pai/mãe sem solução: a idade exigida passaria de {IDADE_MAXIMA} anos")
+
+    # Preencher colunas opcionais se vazias
+    preenchidos = preencher_opcionais(df, rng)
+    if preenchidos:
+        print("🧩 Campos opcionais preenchidos: " + ", ".join(f"{col} {n}" for col, n in preenchidos.items()))
+
+    return df
+
+def _mascara(total, linhas):
+    mascara = np.zeros(total, dtype=bool)
+    mascara[linhas] = True
+    return mascara
+
+def _participacao_indevida(colunas, coluna):
+    j = particip_cols.index(coluna)
+    return colunas["participacoes"][:, j] & ~colunas["permitidas"][:, j]
+
+# Participações conferidas pela regra geral (tresures/gems são conferidas à parte)
+colunas_sem_regra_propria = [j for j, col in enumerate(particip_cols) if col not in ("tresures", "gems")]
+
+def colunas_validacao(df):
+    """Colunas normalizadas (cargo minúsculo, textos sem espaços, números) usadas pelas regras"""
+    texto = lambda col: df[col].astype("string").str.strip()
+    cargo = texto("cargo").str.lower()
+    menor = df["menor"].eq(True).to_numpy()
+    familia = IndiceFamilias(df).problemas()
+    return {
+        "nome": texto("nome").str.len().lt(2).fillna(False).to_numpy(dtype=bool),
+        "idade": pd.to_numeric(df["idade"], errors="coerce").to_numpy(dtype=float),
+        "tempo": pd.to_numeric(df["tempo"], errors="coerce").to_numpy(dtype=float),
+        "genero": df["genero"].to_numpy(dtype=object),
+        "familia_vazia": texto("familia").eq("").fillna(False).to_numpy(dtype=bool),
+        "cargo": cargo.to_numpy(dtype=object, na_value=None),
+        "batizado": cargo.isin(cargos_batizados).to_numpy(dtype=bool),
+        "nao_batizado": cargo.isin(cargos_nao_batizados).to_numpy(dtype=bool),
+        "masculino": cargo.isin(cargos_masculinos).to_numpy(dtype=bool),
+        "feminino": cargo.isin(cargos_femininos).to_numpy(dtype=bool),
+        "sem_batismo": df["data_batismo"].isna().to_numpy(),
+        "sem_matricula": df["data_de_matricula"].isna().to_numpy(),
+        "menor": menor,
+        "sem_responsavel": menor & texto("responsavel_primario").eq("").fillna(False).to_numpy(dtype=bool),
+        "estado_civil": df["estado_civil"].to_numpy(dtype=object),
+        "participacoes": df[particip_cols].eq(True).to_numpy(),
+        "permitidas": participacoes_permitidas(cargo.to_numpy(dtype=object, na_value=None)),
+        "familia": {problema: _mascara(len(df), linhas) for problema, linhas in familia.items()},
+    }
+
+# 📌 Regras de validação: (nome, nível, máscara das linhas afetadas). As máscaras
+# usam as colunas normalizadas uma única vez por colunas_validacao
+REGRAS_VALIDACAO = [
+    # Erros críticos
+    ("Nomes inválidos (<2 chars)", "erro", lambda c: c["nome"]),
+    ("Idades inválidas", "erro", lambda c: (c["idade"] < 1) | (c["idade"] > 120)),
+    ("Gêneros inválidos", "erro", lambda c: ~np.isin(c["genero"], ["M", "F"])),
+    ("Famílias vazias", "erro", lambda c: c["familia_vazia"]),
+    ("Batizados sem data_batismo", "erro", lambda c: c["batizado"] & c["sem_batismo"]),
+    ("Não batizados sem data_de_matricula", "erro", lambda c: c["nao_batizado"] & c["sem_matricula"]),
+    ("Menores sem responsável primário", "erro", lambda c: c["sem_responsavel"]),
+    ("Anciãos sem requisitos (idade<21 ou tempo<4)", "erro",
+     lambda c: (c["cargo"] == "anciao") & ((c["idade"] < 21) | (c["tempo"] < 4))),
+    ("Servos sem requisitos (idade<16 ou tempo<2)", "erro",
+     lambda c: (c["cargo"] == "servo_ministerial") & ((c["idade"] < 16) | (c["tempo"] < 2))),
+    ("Pioneiros sem tempo >=1", "erro",
+     lambda c: np.isin(c["cargo"], ["pioneiro_regular", "pioneira_regular"]) & (c["tempo"] < 1)),
+    ("Gênero incompatível com cargo", "erro",
+     lambda c: (c["masculino"] & (c["genero"] == "F")) | (c["feminino"] & (c["genero"] == "M"))),
+    ("Tresures inválido", "erro", lambda c: _participacao_indevida(c, "tresures")),
+    ("Gems inválido", "erro", lambda c: _participacao_indevida(c, "gems")),
+    # Só participações marcadas sem permissão; tresures/gems já têm regra própria
+    ("Participações fora da regra do cargo", "erro",
+     lambda c: np.isin(c["cargo"], cargos_participacao)
+     & (c["participacoes"] & ~c["permitidas"])[:, colunas_sem_regra_propria].any(axis=1)),
+    # Avisos
+    ("Menores com estado_civil != solteiro", "aviso", lambda c: c["menor"] & (c["estado_civil"] != "solteiro")),
+    ("user_id repetido", "aviso", lambda c: c["familia"]["user_id_duplicado"]),
+    ("Vínculos para user_id inexistente", "aviso", lambda c: c["familia"]["referencia_solta"]),
+    ("Vínculos pai/mãe em ciclo", "aviso", lambda c: c["familia"]["vinculo_em_ciclo"]),
+    ("Cônjuges sem vínculo recíproco", "aviso", lambda c: c["familia"]["conjuge_sem_reciprocidade"]),
+    ("Menores sem responsável válido", "aviso", lambda c: c["familia"]["menor_sem_responsavel"]),
+]
+
+# Acima desta fração de linhas com erro crítico a planilha não é salva
+LIMITE_ERROS = 0.05
+MAX_EXEMPLOS = 5
+
+def _imprimir_regras(regras):
+    for regra in regras:
+        if regra["total"] > 0:
+            print(f"  - {regra['regra']}: {regra['total']}")
+            rotulo = "Exemplo: Linha" if regra["total"] == 1 else "Exemplos: Linhas"
+            print(f"    {rotulo} {', '.join(map(str, regra['linhas']))}")
 
 # 📌 Função de validação automática
-def validar_dados(df):
-    erros = {}
-    warnings = {}
+def validar_dados(df, limite_erros=LIMITE_ERROS, exemplos=MAX_EXEMPLOS):
+    """
+    Avalia REGRAS_VALIDACAO sobre as colunas normalizadas e imprime o relatório.
+    Retorna o relatório (JSON-serializável): contagem, linhas de exemplo
+    (numeração do Excel) e tempo de cada regra, e "salvar" = erros críticos
+    dentro do limite_erros
+    """
     total = len(df)
-    
-    # Erros críticos
-    invalid_nome = df["nome"].str.strip().str.len() < 2
-    erros["Nomes inválidos (<2 chars)"] = invalid_nome.sum()
-    
-    invalid_idade = (df["idade"] < 1) | (df["idade"] > 120)
-    erros["Idades inválidas"] = invalid_idade.sum()
-    
-    invalid_genero = ~df["genero"].isin(["M", "F"])
-    erros["Gêneros inválidos"] = invalid_genero.sum()
-    
-    invalid_familia = df["familia"].str.strip() == ""
-    erros["Famílias vazias"] = invalid_familia.sum()
-    
-    # Batismo obrigatório para batizados
-    batizados_sem_batismo = df[(df["cargo"].str.lower().isin(["anciao", "servo_ministerial", "pioneiro_regular", "pioneira_regular", "publicador_batizado", "publicadora_batizada"])) & (df["data_batismo"].isna())]
-    erros["Batizados sem data_batismo"] = len(batizados_sem_batismo)
-    
-    # Matrícula obrigatória para não batizados
-    nao_batizados_sem_matricula = df[(df["cargo"].str.lower().isin(["estudante_novo", "estudante_nova", "publicador_nao_batizado", "publicadora_nao_batizada"])) & (df["data_de_matricula"].isna())]
-    erros["Não batizados sem data_de_matricula"] = len(nao_batizados_sem_matricula)
-    
-    # Menores sem responsável primário
-    menores_sem_resp = df[(df["menor"] == True) & (df["responsavel_primario"].str.strip() == "")]
-    erros["Menores sem responsável primário"] = len(menores_sem_resp)
-    
-    # Menores com estado_civil != solteiro
-    menores_errado_civil = df[(df["menor"] == True) & (df["estado_civil"] != "solteiro")]
-    warnings["Menores com estado_civil != solteiro"] = len(menores_errado_civil)
-    
-    # Ancião sem requisitos
-    ancião_invalido = df[(df["cargo"].str.lower() == "anciao") & ((df["idade"] < 21) | (df["tempo"] < 4))]
-    erros["Anciãos sem requisitos (idade<21 ou tempo<4)"] = len(ancião_invalido)
-    
-    # Servo sem requisitos
-    servo_invalido = df[(df["cargo"].str.lower() == "servo_ministerial") & ((df["idade"] < 16) | (df["tempo"] < 2))]
-    erros["Servos sem requisitos (idade<16 ou tempo<2)"] = len(servo_invalido)
-    
-    # Pioneiro sem tempo >=1
-    pioneiro_invalido = df[df["cargo"].str.lower().isin(["pioneiro_regular", "pioneira_regular"]) & (df["tempo"] < 1)]
-    erros["Pioneiros sem tempo >=1"] = len(pioneiro_invalido)
-    
-    # Gênero incompatível com cargo
-    cargos_masc = ["anciao", "servo_ministerial", "pioneiro_regular", "publicador_batizado", "publicador_nao_batizado", "estudante_novo"]
-    cargos_fem = ["pioneira_regular", "publicadora_batizada", "publicadora_nao_batizada", "estudante_nova"]
-    genero_incomp_masc = df[(df["cargo"].str.lower().isin(cargos_masc)) & (df["genero"] == "F")]
-    genero_incomp_fem = df[(df["cargo"].str.lower().isin(cargos_fem)) & (df["genero"] == "M")]
-    erros["Gênero incompatível com cargo"] = len(genero_incomp_masc) + len(genero_incomp_fem)
-    
-    # Tresures/gems só para ancião/servo
-    invalid_tresures = df[(df["tresures"] == True) & (~df["cargo"].str.lower().isin(["anciao", "servo_ministerial"]))]
-    invalid_gems = df[(df["gems"] == True) & (~df["cargo"].str.lower().isin(["anciao", "servo_ministerial"]))]
-    erros["Tresures inválido"] = len(invalid_tresures)
-    erros["Gems inválido"] = len(invalid_gems)
-    
+    inicio = time.perf_counter()
+    colunas = colunas_validacao(df)
+    relatorio = {"total_registros": total, "preparacao_ms": round((time.perf_counter() - inicio) * 1000, 2),
+                 "regras": []}
+    for nome, nivel, regra in REGRAS_VALIDACAO:
+        inicio = time.perf_counter()
+        afetadas = np.flatnonzero(regra(colunas))
+        relatorio["regras"].append({
+            "regra": nome, "nivel": nivel, "total": len(afetadas),
+            "linhas": [int(linha) + 2 for linha in afetadas[:exemplos]],
+            "ms": round((time.perf_counter() - inicio) * 1000, 2),
+        })
+
+    erros = [regra for regra in relatorio["regras"] if regra["nivel"] == "erro"]
+    avisos = [regra for regra in relatorio["regras"] if regra["nivel"] == "aviso"]
+    total_erros = sum(regra["total"] for regra in erros)
+    taxa = total_erros / total if total else 0.0
+    relatorio.update({"total_erros": total_erros, "total_avisos": sum(regra["total"] for regra in avisos),
+                      "taxa_erros": round(taxa, 4), "limite_erros": limite_erros, "salvar": taxa <= limite_erros})
+
     # Relatório
-    total_erros = sum(erros.values())
     print("\n🔍 RELATÓRIO DE VALIDAÇÃO:")
     print(f"Total de registros: {total}")
-    print(f"Total de erros críticos: {total_erros} ({total_erros/total*100:.1f}%)")
+    print(f"Total de erros críticos: {total_erros} ({taxa*100:.1f}%)")
     if total_erros > 0:
         print("❌ ERROS ENCONTRADOS:")
-        for k, v in erros.items():
-            if v > 0:
-                print(f"  - {k}: {v}")
-                # Exemplo de 1 registro com erro (adaptado para nomes)
-                if "Nomes" in k and invalid_nome.any():
-                    ex_idx = df[invalid_nome].index[0]
-                    exemplo = df.at[ex_idx, "nome"]
-                    print(f"    Exemplo: Linha {ex_idx + 2} - '{exemplo}'")
-                elif "Batizados sem data_batismo" in k and len(batizados_sem_batismo) > 0:
-                    ex_idx = batizados_sem_batismo.index[0]
-                    print(f"    Exemplo: Linha {ex_idx + 2} - Cargo: {df.at[ex_idx, 'cargo']}")
+        _imprimir_regras(erros)
     else:
         print("✅ Nenhum erro crítico!")
-    
-    total_warnings = sum(warnings.values())
-    if total_warnings > 0:
-        print(f"\n⚠️ AVISOS: {total_warnings}")
-        for k, v in warnings.items():
-            if v > 0:
-                print(f"  - {k}: {v}")
-    
-    if total_erros / total > 0.05:  # >5% erros, avisa
-        print(f"\n🚨 Mais de 5% de erros! Verifique antes de salvar.")
-        response = input("Salvar mesmo assim? (s/n): ")
-        salvar = response.lower() == 's'
-    else:
-        salvar = True
-    
-    return salvar
 
-# 📌 Reordenar colunas
-df = df[colunas_necessarias]
+    if relatorio["total_avisos"] > 0:
+        print(f"\n⚠️ AVISOS: {relatorio['total_avisos']}")
+        _imprimir_regras(avisos)
 
-# 🧪 Rodar validação antes de salvar
-salvar = validar_dados(df)
+    if not relatorio["salvar"]:
+        print(f"\n🚨 Mais de {limite_erros*100:g}% de erros! Verifique antes de salvar.")
+    return relatorio
+
+def main():
+    parser = argparse.ArgumentParser(description="Corrige a planilha de estudantes pelas regras S-38")
+    parser.add_argument("--no-cache", action="store_true", help="Relê a planilha ignorando o cache")
+    parser.add_argument("--seed", type=int, help="Semente dos valores sorteados, para correções reproduzíveis")
+    parser.add_argument("--limite-erros", type=float, default=LIMITE_ERROS,
+                        help=f"Fração máxima de linhas com erro crítico para salvar (padrão: {LIMITE_ERROS})")
+    parser.add_argument("--relatorio", help="Grava o relatório da validação em JSON neste arquivo")
+    args = parser.parse_args()
+
+    print(f"📂 Lendo planilha: {input_file}")
+    df = read_excel_cached(input_file, use_cache=not args.no_cache)
+
+    df = corrigir_planilha(df, seed=args.seed)
+
+    # 📌 Reordenar colunas
+    df = df[colunas_necessarias]
+
+    # 🧪 Rodar validação antes de salvar
+    relatorio = validar_dados(df, limite_erros=args.limite_erros)
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+    if relatorio["salvar"]:
+        df.to_excel(output_file, index=False)
+        print(f"\n✅ Planilha corrigida salva em: {output_file}")
+    else:
+        print("❌ Salvamento cancelado. Execute novamente após ajustes manuais ou com --limite-erros maior.")
+        sys.exit(1)
 
-if salvar:
-    df.to_excel(output_file, index=False)
-    print(f"\n✅ Planilha corrigida salva em: {output_file}")
-else:
-    print("❌ Salvamento cancelado. Execute novamente após ajustes manuais.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Divide os estudantes convertidos em lotes para a função process_estudantes_batch
+Cada lote é limitado por quantidade de registros e por tamanho em bytes, para
+que cada chamada no Supabase tenha uma duração previsível
+"""
+
+import argparse
+import contextlib
+import gzip
+import json
+import os
+import re
+import sys
+
+# Limites padrão de cada lote
+DEFAULT_MAX_ROWS = 500
+DEFAULT_MAX_BYTES = 256 * 1024
+
+def iter_batches(records, max_rows=DEFAULT_MAX_ROWS, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Agrupa os registros em payloads JSON (texto do array) de até max_rows
+    registros e até max_bytes bytes já escapados para o literal SQL.
+    Um registro maior que max_bytes sozinho vira um lote próprio.
+    Gera (payload, quantidade de registros)
+    """
+    if max_rows < 1 or max_bytes < 1:
+        raise ValueError("max_rows e max_bytes devem ser maiores que zero")
+
+    lote = []
+    tamanho = 2  # colchetes do array
+    for record in records:
+        texto = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        tamanho_registro = len(_sql_escape(texto).encode('utf-8')) + (1 if lote else 0)
+        if lote and (len(lote) >= max_rows or tamanho + tamanho_registro > max_bytes):
+            yield "[" + ",".join(lote) + "]", len(lote)
+            lote = []
+            tamanho = 2
+            tamanho_registro -= 1  # sem vírgula no início do lote
+        if not lote and tamanho + tamanho_registro > max_bytes:
+            print(f"⚠️  Registro {record.get('id')} tem {tamanho_registro} bytes e excede o limite do lote",
+                  file=sys.stderr)
+        lote.append(texto)
+        tamanho += tamanho_registro
+    if lote:
+        yield "[" + ",".join(lote) + "]", len(lote)
+
+def render_batch_sql(payload):
+    """Comando SQL que envia um lote para process_estudantes_batch"""
+    return f"SELECT process_estudantes_batch('{_sql_escape(payload)}'::JSONB);\n"
+
+def send_batches(records, loader, max_rows=DEFAULT_MAX_ROWS, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Envia cada lote para loader(payload) à medida que é montado, sem arquivos
+    intermediários. Retorna [(registros, bytes)] de cada lote enviado
+    """
+    enviados = []
+    for payload, registros in iter_batches(records, max_rows, max_bytes):
+        loader(payload)
+        enviados.append((registros, len(payload.encode('utf-8'))))
+    return enviados
+
+def write_batch_files(records, output_dir, prefix="estudantes_batch", max_rows=DEFAULT_MAX_ROWS,
+                      max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Grava um arquivo SQL numerado por lote (prefix_0001.sql, ...) em output_dir.
+    Os arquivos numerados de uma execução anterior são apagados antes, para que
+    lotes antigos não sejam aplicados de novo. Retorna [(caminho, registros, bytes)]
+    de cada arquivo
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    numerado = re.compile(re.escape(prefix) + r"_\d{4,}\.sql")
+    for nome in os.listdir(output_dir):
+        if numerado.fullmatch(nome):
+            os.remove(os.path.join(output_dir, nome))
+    arquivos = []
+    for numero, (payload, registros) in enumerate(iter_batches(records, max_rows, max_bytes), start=1):
+        sql = render_batch_sql(payload)
+        caminho = os.path.join(output_dir, f"{prefix}_{numero:04d}.sql")
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(sql)
+        arquivos.append((caminho, registros, len(sql.encode('utf-8'))))
+    return arquivos
+
+def iter_json_records(path):
+    """
+    Lê os registros de um arquivo gerado pelo conversor: array JSON (indentado
+    ou compacto), JSON Lines ou arquivo delta (só a lista 'upsert'; os ids em
+    'deleted' são removidos à parte), opcionalmente .gz. JSON Lines é lido em
+    streaming
+    """
+    abrir = gzip.open if path.endswith('.gz') else open
+    with abrir(path, 'rt', encoding='utf-8') as f:
+        primeiro = f.read(1)
+        while primeiro and primeiro.isspace():
+            primeiro = f.read(1)
+        if primeiro == '[':
+            f.seek(0)
+            yield from json.load(f)
+            return
+        f.seek(0)
+        primeira_linha = f.readline()
+        try:
+            registro = json.loads(primeira_linha) if primeira_linha.strip() else None
+        except ValueError:
+            # Objeto em várias linhas: arquivo delta
+            f.seek(0)
+            registro = json.load(f)
+        if isinstance(registro, dict) and 'upsert' in registro and 'deleted' in registro:
+            if registro['deleted']:
+                print(f"⚠️  {len(registro['deleted'])} ids em 'deleted' não entram nos lotes; remova-os à parte",
+                      file=sys.stderr)
+            yield from registro['upsert']
+            return
+        if registro is not None:
+            yield registro
+        for linha in f:
+            if linha.strip():
+                yield json.loads(linha)
+
+def _sql_escape(texto):
+    return texto.replace("'", "''")
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Divide os estudantes convertidos em lotes para process_estudantes_batch")
+    origem = parser.add_mutually_exclusive_group()
+    origem.add_argument("--input", default="estudantes_refinados_converted.json",
+                        help="JSON convertido (array ou JSON Lines, .gz aceito)")
+    origem.add_argument("--excel", help="Lê e converte direto da planilha, sem JSON intermediário")
+    parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS,
+                        help=f"Registros por lote (padrão: {DEFAULT_MAX_ROWS})")
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES,
+                        help=f"Tamanho máximo do payload de cada lote em bytes (padrão: {DEFAULT_MAX_BYTES})")
+    parser.add_argument("--out-dir", default="estudantes_batches",
+                        help="Pasta dos arquivos SQL numerados")
+    parser.add_argument("--stdout", action="store_true",
+                        help="Escreve os comandos SQL na saída padrão (ex.: para canalizar no psql)")
+    args = parser.parse_args()
+
+    if args.excel:
+        from convert_excel_to_json import iter_records
+        records = iter_records(args.excel)
+    else:
+        if not os.path.exists(args.input):
+            print(f"Arquivo JSON não encontrado: {args.input}", file=sys.stderr)
+            sys.exit(1)
+        records = iter_json_records(args.input)
+
+    if args.stdout:
+        # Só os comandos SQL vão para a saída padrão; mensagens do conversor vão para stderr
+        saida = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            lotes = send_batches(records, lambda payload: saida.write(render_batch_sql(payload)),
+                                 args.max_rows, args.max_bytes)
+        print(f"{len(lotes)} lotes, {sum(n for n, _ in lotes)} registros", file=sys.stderr)
+        return
+
+    arquivos = write_batch_files(records, args.out_dir, max_rows=args.max_rows, max_bytes=args.max_bytes)
+    print(f"Lotes gerados em: {args.out_dir}")
+    for caminho, registros, tamanho in arquivos:
+        print(f"  - {os.path.basename(caminho)}: {registros} registros, {tamanho} bytes")
+    print(f"Total: {len(arquivos)} lotes, {sum(r for _, r, _ in arquivos)} registros")
+
+if __name__ == "__main__":
+    main()
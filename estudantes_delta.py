@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Conversão incremental dos estudantes
+Compara os registros normalizados com o snapshot anterior (um manifesto com o
+hash de cada registro por id) e separa só o que foi inserido, alterado ou removido
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+MANIFEST_VERSION = 1
+
+# Namespace dos ids estáveis dos estudantes (uuid5 do user_id ou do email),
+# os mesmos na conversão delta e no upload com --upsert
+ESTUDANTES_NAMESPACE = uuid.UUID('5a1c7e3e-9d0b-4f2a-8b6e-2f4c1d9e7a35')
+
+def record_hash(record):
+    """Hash estável do registro (independe da ordem das chaves)"""
+    texto = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=16).hexdigest()
+
+def stable_student_ids(user_ids, emails, fallback):
+    """
+    Ids estáveis dos estudantes, iguais em todas as ferramentas: uuid5 do
+    user_id ou, na falta dele, do email (minúsculo). As linhas sem nenhum dos
+    dois recebem fallback(linha). Retorna (ids, linhas_sem_chave)
+    """
+    ids = []
+    sem_chave = 0
+    for linha, (user_id, email) in enumerate(zip(user_ids, emails)):
+        if not pd.isna(user_id) and str(user_id).strip():
+            ids.append(str(uuid.uuid5(ESTUDANTES_NAMESPACE, f"user_id:{str(user_id).strip()}")))
+        elif not pd.isna(email) and str(email).strip():
+            ids.append(str(uuid.uuid5(ESTUDANTES_NAMESPACE, f"email:{str(email).strip().lower()}")))
+        else:
+            ids.append(fallback(linha))
+            sem_chave += 1
+    return ids, sem_chave
+
+def load_snapshot(path):
+    """
+    Carrega os hashes por id do snapshot anterior gravado por write_manifest.
+    Retorna {} se o arquivo não existir (primeira execução: tudo é inserido).
+    Um JSON convertido (array de registros) é recusado: os ids dele são uuid4
+    sorteados a cada conversão, não os ids estáveis do delta, e todos os
+    estudantes sairiam como removidos
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        dados = json.load(f)
+    if not isinstance(dados, dict):
+        raise ValueError(f"{path} não é um manifesto (JSON convertido?); "
+                         f"aponte --manifest para um arquivo novo para gerar a base do zero")
+    if dados.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Versão de manifesto não suportada: {dados.get('version')}")
+    if dados.get('kind', 'records') != 'records':
+        raise ValueError(f"O manifesto {path} não é de registros ({dados.get('kind')})")
+    return dados['records']
+
+def compute_delta(records, previous_hashes):
+    """
+    Compara os registros atuais com os hashes anteriores
+
+    Retorna (inseridos, alterados, removidos, hashes_atuais): os dois primeiros
+    são listas de registros, removidos é a lista de ids que sumiram e
+    hashes_atuais é o conteúdo do novo manifesto
+    """
+    inseridos = []
+    alterados = []
+    hashes = {}
+    duplicados = 0
+    for record in records:
+        record_id = str(record['id'])
+        if record_id in hashes:
+            duplicados += 1
+        hashes[record_id] = record_hash(record)
+        anterior = previous_hashes.get(record_id)
+        if anterior is None:
+            inseridos.append(record)
+        elif anterior != hashes[record_id]:
+            alterados.append(record)
+    if duplicados:
+        print(f"⚠️  {duplicados} registros com id repetido; o último de cada id prevalece no manifesto")
+
+    removidos = sorted(record_id for record_id in previous_hashes if record_id not in hashes)
+    return inseridos, alterados, removidos, hashes
+
+def write_delta(path, inseridos, alterados, removidos, base):
+    """
+    Grava o delta: 'upsert' (inseridos + alterados, pronto para
+    process_estudantes_batch) e 'deleted' (ids removidos)
+    """
+    delta = {
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "base": base,
+        "counts": {"inserted": len(inseridos), "changed": len(alterados), "deleted": len(removidos)},
+        "upsert": inseridos + alterados,
+        "deleted": removidos,
+    }
+    _write_json_atomic(path, delta, indent=2)
+
+def write_manifest(path, hashes):
+    """Grava o novo manifesto (só depois do delta, para não avançar a base se algo falhar)"""
+    _check_manifest(path, 'records')
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "records": hashes,
+    }
+    _write_json_atomic(path, manifest)
+
+def column_hashes(valores):
+    """Hash curto de cada coluna de um registro ({coluna: texto})"""
+    return {coluna: hashlib.blake2b(str(texto).encode('utf-8'), digest_size=8).hexdigest()
+            for coluna, texto in valores.items()}
+
+def load_column_manifest(path):
+    """
+    Carrega os hashes por coluna de cada id gravados por write_column_manifest
+    ({id: {coluna: hash}}). Retorna {} se o arquivo não existir
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        dados = json.load(f)
+    if dados.get('version') != MANIFEST_VERSION or dados.get('kind') != 'columns':
+        raise ValueError(f"Manifesto de colunas inválido: {path}")
+    return dados['records']
+
+def write_column_manifest(path, hashes):
+    """Grava o manifesto com os hashes por coluna de cada id"""
+    _check_manifest(path, 'columns')
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "kind": "columns",
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "records": hashes,
+    }
+    _write_json_atomic(path, manifest)
+
+def _check_manifest(path, kind):
+    """Recusa sobrescrever um arquivo existente que não seja um manifesto desse tipo"""
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+    except ValueError:
+        dados = None
+    if not isinstance(dados, dict) or dados.get('version') != MANIFEST_VERSION or dados.get('kind', 'records') != kind:
+        raise ValueError(f"{path} já existe e não é um manifesto; não será sobrescrito")
+
+def _write_json_atomic(path, dados, indent=None):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, path)
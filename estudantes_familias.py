@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Índice e validação dos vínculos familiares dos estudantes
+Os vínculos (id_pai, id_mae, id_conjuge, responsavel_primario,
+responsavel_secundario → user_id, e o family_id) são resolvidos uma única vez
+para posições de linha em arrays NumPy: lista de adjacência compacta (CSR), o
+grupo familiar de cada linha para consultas "mesma família?" em O(1) e as
+verificações de ciclos, referências soltas, cônjuges sem reciprocidade e
+menores sem responsável válido
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Colunas de vínculo, na ordem das relações guardadas no índice
+REFERENCIAS = ("id_pai", "id_mae", "id_conjuge", "responsavel_primario", "responsavel_secundario")
+
+# Relação vista de cada lado do vínculo (linha → referência, referência → linha)
+RELACOES = {
+    "id_pai": ("pai", "filho"),
+    "id_mae": ("mae", "filho"),
+    "id_conjuge": ("conjuge", "conjuge"),
+    "responsavel_primario": ("responsavel", "dependente"),
+    "responsavel_secundario": ("responsavel", "dependente"),
+}
+
+# Vínculos que definem a família (além do family_id); responsáveis podem ser de fora
+VINCULOS_FAMILIARES = ("id_pai", "id_mae", "id_conjuge")
+
+MAX_EXEMPLOS = 5
+
+def _texto(serie):
+    """Ids como texto sem espaços; ausentes e vazios viram NA"""
+    texto = serie.astype("string").str.strip()
+    return texto.mask(texto.eq(""))
+
+def vinculos_em_ciclo(total, filhos, pais):
+    """
+    Vínculos filho → pai/mãe dentro de um ciclo (ex.: a pessoa é pai do próprio
+    avô): as duas pontas na mesma componente fortemente conexa com mais de uma
+    linha, ou a linha ligada a si mesma. Quem não tem filho ou não tem pai/mãe
+    entre os restantes é removido antes, até sobrarem os ciclos e os caminhos
+    entre eles; as componentes são calculadas só sobre o que sobrou
+    """
+    restantes = np.ones(total, dtype=bool)
+    while True:
+        ligados = restantes[filhos] & restantes[pais]
+        com_filho = np.zeros(total, dtype=bool)
+        com_filho[pais[ligados]] = True
+        com_pai = np.zeros(total, dtype=bool)
+        com_pai[filhos[ligados]] = True
+        proximos = restantes & com_filho & com_pai
+        if (proximos == restantes).all():
+            break
+        restantes = proximos
+
+    em_ciclo = restantes[filhos] & restantes[pais]
+    if not em_ciclo.any():
+        return em_ciclo
+    linhas = np.flatnonzero(restantes)
+    posicao = np.full(total, -1)
+    posicao[linhas] = np.arange(len(linhas))
+    origem, destino = posicao[filhos[em_ciclo]], posicao[pais[em_ciclo]]
+    rotulo = componentes_fortes(len(linhas), origem, destino)
+    tamanho = np.bincount(rotulo)
+    em_ciclo[em_ciclo] = (rotulo[origem] == rotulo[destino]) & ((tamanho[rotulo[origem]] > 1) | (origem == destino))
+    return em_ciclo
+
+def componentes_fortes(total, origem, destino):
+    """
+    Componente fortemente conexa de cada linha (Tarjan iterativo sobre a lista
+    de adjacência CSR das arestas origem → destino); os rótulos vão de 0 ao
+    número de componentes - 1
+    """
+    ordem = np.argsort(origem, kind="stable")
+    vizinhos = destino[ordem].tolist()
+    inicio = np.concatenate(([0], np.cumsum(np.bincount(origem, minlength=total)))).tolist()
+    indice = [-1] * total
+    baixo = [0] * total
+    rotulo = [-1] * total
+    na_pilha = [False] * total
+    pilha = []
+    contador = 0
+    componente = 0
+    for raiz in range(total):
+        if indice[raiz] >= 0:
+            continue
+        indice[raiz] = baixo[raiz] = contador
+        contador += 1
+        pilha.append(raiz)
+        na_pilha[raiz] = True
+        # Pilha de chamadas: (linha, próximo vizinho a visitar)
+        chamadas = [[raiz, inicio[raiz]]]
+        while chamadas:
+            topo = chamadas[-1]
+            v = topo[0]
+            if topo[1] < inicio[v + 1]:
+                w = vizinhos[topo[1]]
+                topo[1] += 1
+                if indice[w] < 0:
+                    indice[w] = baixo[w] = contador
+                    contador += 1
+                    pilha.append(w)
+                    na_pilha[w] = True
+                    chamadas.append([w, inicio[w]])
+                elif na_pilha[w]:
+                    baixo[v] = min(baixo[v], indice[w])
+                continue
+            chamadas.pop()
+            if chamadas:
+                u = chamadas[-1][0]
+                baixo[u] = min(baixo[u], baixo[v])
+            if baixo[v] == indice[v]:
+                while True:
+                    w = pilha.pop()
+                    na_pilha[w] = False
+                    rotulo[w] = componente
+                    if w == v:
+                        break
+                componente += 1
+    return np.array(rotulo, dtype=np.int64)
+
+def componentes(total, origem, destino):
+    """
+    Componente conexa de cada linha (a menor linha do componente), por união
+    das raízes de cada aresta e compressão de caminhos até estabilizar
+    """
+    rotulo = np.arange(total)
+    while True:
+        menor = np.minimum(rotulo[origem], rotulo[destino])
+        novo = rotulo.copy()
+        np.minimum.at(novo, rotulo[origem], menor)
+        np.minimum.at(novo, rotulo[destino], menor)
+        while True:
+            saltos = novo[novo]
+            if (saltos == novo).all():
+                break
+            novo = saltos
+        if (novo == rotulo).all():
+            return rotulo
+        rotulo = novo
+
+class IndiceFamilias:
+    """
+    Vínculos familiares da planilha resolvidos para posições de linha (-1 =
+    sem vínculo). O primeiro user_id repetido prevalece; referências a ids que
+    não existem ficam marcadas em soltas
+    """
+
+    def __init__(self, df):
+        self.total = len(df)
+        ids = _texto(df["user_id"])
+        presente = ids.notna().to_numpy()
+        repetido = ids.duplicated().to_numpy()
+        self.duplicados = presente & repetido
+        linhas = np.flatnonzero(presente & ~repetido)
+        self.ids = ids
+        self.posicoes = pd.Index(ids.to_numpy()[linhas])
+        self._linhas = linhas
+
+        # Referência de cada coluna → linha, e referências a ids inexistentes
+        self.vinculos = {}
+        self.soltas = {}
+        for col in REFERENCIAS:
+            if col not in df.columns:
+                self.vinculos[col] = np.full(self.total, -1)
+                self.soltas[col] = np.zeros(self.total, dtype=bool)
+                continue
+            alvo = _texto(df[col])
+            encontrado = self.posicoes.get_indexer(alvo.to_numpy())
+            self.vinculos[col] = np.where(encontrado >= 0, linhas[encontrado], -1)
+            self.soltas[col] = alvo.notna().to_numpy() & (encontrado < 0)
+
+        # Menores pela coluna menor ou, na falta dela, pela idade; sem nenhuma, ninguém é menor
+        if "menor" in df.columns:
+            self.menor = df["menor"].eq(True).to_numpy()
+        elif "idade" in df.columns:
+            self.menor = (pd.to_numeric(df["idade"], errors="coerce") < 18).to_numpy()
+        else:
+            self.menor = np.zeros(self.total, dtype=bool)
+
+        # Lista de adjacência (CSR): vizinhos[inicio[i]:inicio[i + 1]] e a relação de cada um
+        origem, destino, relacao = [], [], []
+        nomes = []
+        for col in REFERENCIAS:
+            linha = np.flatnonzero(self.vinculos[col] >= 0)
+            alvo = self.vinculos[col][linha]
+            for de, para, nome in ((linha, alvo, RELACOES[col][0]), (alvo, linha, RELACOES[col][1])):
+                if nome not in nomes:
+                    nomes.append(nome)
+                origem.append(de)
+                destino.append(para)
+                relacao.append(np.full(len(de), nomes.index(nome), dtype=np.int8))
+        origem, destino, relacao = np.concatenate(origem), np.concatenate(destino), np.concatenate(relacao)
+        # Vínculos recíprocos (cônjuges, pai também registrado como responsável) aparecem uma vez só
+        ordem = np.lexsort((relacao, destino, origem))
+        origem, destino, relacao = origem[ordem], destino[ordem], relacao[ordem]
+        unico = np.ones(len(origem), dtype=bool)
+        unico[1:] = (np.diff(origem) != 0) | (np.diff(destino) != 0) | (np.diff(relacao) != 0)
+        self.vizinhos = destino[unico]
+        self.relacoes = relacao[unico]
+        self.nomes_relacoes = nomes
+        self.inicio = np.searchsorted(origem[unico], np.arange(self.total + 1))
+
+        # Grupo familiar: mesmo family_id ou ligados por pai, mãe ou cônjuge
+        origem, destino = [], []
+        for col in VINCULOS_FAMILIARES:
+            linha = np.flatnonzero(self.vinculos[col] >= 0)
+            origem.append(linha)
+            destino.append(self.vinculos[col][linha])
+        if "family_id" in df.columns:
+            codigos = pd.factorize(_texto(df["family_id"]))[0]
+            com_familia = np.flatnonzero(codigos >= 0)
+            _, primeira = np.unique(codigos[com_familia], return_index=True)
+            origem.append(com_familia)
+            destino.append(com_familia[primeira][codigos[com_familia]])
+        self.grupo = componentes(self.total, np.concatenate(origem), np.concatenate(destino))
+
+    def linha(self, user_id):
+        """Posição da linha do user_id, ou None"""
+        posicao = self.posicoes.get_indexer([str(user_id).strip()])[0]
+        return int(self._linhas[posicao]) if posicao >= 0 else None
+
+    def mesma_familia(self, user_id, outro_id):
+        """Se os dois estudantes são do mesmo grupo familiar (False se algum não existir)"""
+        linha, outra = self.linha(user_id), self.linha(outro_id)
+        return linha is not None and outra is not None and self.grupo[linha] == self.grupo[outra]
+
+    def parentes(self, user_id):
+        """[(user_id, relação)] dos vínculos diretos do estudante"""
+        linha = self.linha(user_id)
+        if linha is None:
+            return []
+        inicio, fim = self.inicio[linha], self.inicio[linha + 1]
+        return [(self.ids.iat[vizinho], self.nomes_relacoes[relacao])
+                for vizinho, relacao in zip(self.vizinhos[inicio:fim], self.relacoes[inicio:fim])]
+
+    def vinculos_pais(self):
+        """(filhos, pais): linhas de cada vínculo filho → pai/mãe existente"""
+        filhos, pais = [], []
+        for col in ("id_pai", "id_mae"):
+            ligado = np.flatnonzero(self.vinculos[col] >= 0)
+            filhos.append(ligado)
+            pais.append(self.vinculos[col][ligado])
+        return np.concatenate(filhos), np.concatenate(pais)
+
+    def grupos_familiares(self):
+        """
+        Identificador do grupo familiar de cada linha (o menor user_id do grupo),
+        para gravar junto dos estudantes e comparar famílias sem refazer o grafo
+        """
+        ordem = self.ids.array.argsort(na_position="last")
+        posto = np.empty(self.total, dtype=np.int64)
+        posto[ordem] = np.arange(self.total)
+        posto[self.ids.isna().to_numpy()] = self.total
+        menor_posto = np.full(self.total, self.total, dtype=np.int64)
+        np.minimum.at(menor_posto, self.grupo, posto)
+        menor_posto = menor_posto[self.grupo]
+        tem_id = menor_posto < self.total
+        grupos = pd.Series(pd.NA, index=self.ids.index, dtype=self.ids.dtype)
+        grupos[tem_id] = self.ids.iloc[ordem[menor_posto[tem_id]]].to_numpy()
+        return grupos
+
+    def problemas(self):
+        """{problema: linhas afetadas} com todas as verificações do grafo"""
+        linhas = np.arange(self.total)
+        filhos, pais = self.vinculos_pais()
+        em_ciclo = vinculos_em_ciclo(self.total, filhos, pais)
+
+        conjuge = self.vinculos["id_conjuge"]
+        casado = conjuge >= 0
+        reciproco = np.zeros(self.total, dtype=bool)
+        reciproco[casado] = (conjuge[conjuge[casado]] == linhas[casado]) & (conjuge[casado] != linhas[casado])
+
+        responsavel_valido = np.zeros(self.total, dtype=bool)
+        for col in ("responsavel_primario", "responsavel_secundario"):
+            responsavel = self.vinculos[col]
+            tem = responsavel >= 0
+            responsavel_valido[tem] |= (responsavel[tem] != linhas[tem]) & ~self.menor[responsavel[tem]]
+
+        return {
+            "user_id_duplicado": np.flatnonzero(self.duplicados),
+            "referencia_solta": np.flatnonzero(np.logical_or.reduce(list(self.soltas.values()))),
+            "vinculo_em_ciclo": np.unique(filhos[em_ciclo]),
+            "conjuge_sem_reciprocidade": np.flatnonzero(casado & ~reciproco),
+            "menor_sem_responsavel": np.flatnonzero(self.menor & ~responsavel_valido),
+        }
+
+    def relatorio(self, exemplos=MAX_EXEMPLOS):
+        """Contagem de cada problema e as primeiras linhas (numeração do Excel) de exemplo"""
+        return {problema: {"total": len(afetadas), "linhas": [int(linha) + 2 for linha in afetadas[:exemplos]]}
+                for problema, afetadas in self.problemas().items()}
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Valida os vínculos familiares da planilha de estudantes")
+    parser.add_argument("planilha", help="Planilha .xlsx ou arquivo .parquet dos estudantes")
+    parser.add_argument("--exemplos", type=int, default=MAX_EXEMPLOS,
+                        help=f"Linhas de exemplo por problema (padrão: {MAX_EXEMPLOS})")
+    parser.add_argument("--relatorio", help="Grava o relatório em JSON neste arquivo")
+    parser.add_argument("--grupos", help="Grava {user_id: grupo familiar} em JSON neste arquivo")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.planilha):
+        print(f"Arquivo não encontrado: {args.planilha}", file=sys.stderr)
+        sys.exit(1)
+    if args.planilha.endswith(".parquet"):
+        df = pd.read_parquet(args.planilha)
+    else:
+        from planilha_cache import read_excel_cached
+        df = read_excel_cached(args.planilha)
+
+    indice = IndiceFamilias(df)
+    relatorio = indice.relatorio(args.exemplos)
+    print(f"👪 {indice.total} estudantes em {len(np.unique(indice.grupo))} grupos familiares")
+    for problema, resultado in relatorio.items():
+        marcador = "⚠️ " if resultado["total"] else "✅"
+        exemplo = f" (linhas {', '.join(map(str, resultado['linhas']))})" if resultado["total"] else ""
+        print(f"  {marcador} {problema}: {resultado['total']}{exemplo}")
+
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    if args.grupos:
+        grupos = indice.grupos_familiares()
+        com_id = indice.ids.notna() & ~pd.Series(indice.duplicados, index=indice.ids.index)
+        with open(args.grupos, "w", encoding="utf-8") as f:
+            json.dump(dict(zip(indice.ids[com_id], grupos[com_id])), f, ensure_ascii=False)
+
+    sys.exit(1 if any(resultado["total"] for resultado in relatorio.values()) else 0)
+
+if __name__ == "__main__":
+    main()
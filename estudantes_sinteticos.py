@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Gerador de planilhas de estudantes fictícios em grande volume
+Cada bloco de famílias (pai, mãe e filhos) é sorteado de uma vez com NumPy, com
+gênero M/F, cargos, datas e participações coerentes com as regras S-38 (a
+planilha passa em validar_dados sem erros, e corrigir_planilha só troca as
+células vazias de id_pai, id_mae e id_conjuge por ""), e gravado em Parquet,
+NDJSON ou XLSX à medida que é gerado. A mesma semente e o mesmo tamanho de
+bloco geram sempre a mesma planilha
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Nomes, cargos e regras de participação ficam em docs/Oficial/gera_planilha.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "docs", "Oficial"))
+import gera_planilha
+
+FORMATOS = ('parquet', 'ndjson', 'xlsx')
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Pai, mãe e até 3 filhos
+TAMANHO_MAXIMO_FAMILIA = 5
+
+# Limite de linhas de uma planilha do Excel (sem o cabeçalho)
+MAX_LINHAS_XLSX = 1_048_575
+
+# Colunas e ordem da planilha modelo (estudantes_ficticios_corrigido_modelo.xlsx)
+COLUNAS_MODELO = [
+    "family_id", "user_id", "nome", "familia", "idade", "genero", "email", "telefone",
+    "data_batismo", "cargo", "ativo", "observacoes", "created_at", "updated_at",
+    "estado_civil", "papel_familiar", "id_pai", "id_mae", "id_conjuge", "coabitacao", "menor",
+    "responsavel_primario", "responsavel_secundario",
+    "chairman", "pray", "tresures", "gems", "reading", "starting",
+    "following", "making", "explaining", "talk", "data_nascimento",
+]
+
+# Proporção de cada cargo por gênero e faixa etária. Abaixo de 12 anos não há
+# batizados (batismo ≥10 anos após o nascimento e antes do ano atual);
+# ancião e servo só a partir de 21
+CARGOS_POR_FAIXA = {
+    ("M", "adulto"): {"anciao": 0.10, "servo_ministerial": 0.12, "pioneiro_regular": 0.10,
+                      "publicador_batizado": 0.48, "publicador_nao_batizado": 0.10, "estudante_novo": 0.10},
+    ("F", "adulto"): {"pioneira_regular": 0.20, "publicadora_batizada": 0.60,
+                      "publicadora_nao_batizada": 0.10, "estudante_nova": 0.10},
+    ("M", "jovem"): {"publicador_batizado": 0.40, "publicador_nao_batizado": 0.30, "estudante_novo": 0.30},
+    ("F", "jovem"): {"publicadora_batizada": 0.40, "publicadora_nao_batizada": 0.30, "estudante_nova": 0.30},
+    ("M", "crianca"): {"publicador_nao_batizado": 0.40, "estudante_novo": 0.60},
+    ("F", "crianca"): {"publicadora_nao_batizada": 0.40, "estudante_nova": 0.60},
+}
+
+# Anos mínimos de batismo por cargo (S-38); os demais batizados, 1 ano
+ANOS_MINIMOS_BATISMO = {"anciao": 4, "servo_ministerial": 2}
+
+OBSERVACOES = ["Novo na congregação", "Demonstra progresso espiritual", "Exemplo positivo para os jovens",
+               "Precisa de incentivo", "Participa ativamente", "Precisa de acompanhamento", "Instrutor"]
+DOMINIOS = gera_planilha.dominios_email
+ESTADOS_CIVIS_ADULTOS = ["solteiro", "casado", "viúvo"]
+
+# Códigos dos cargos: linha da matriz de participações do gera_planilha, usada também na tabela de batismo
+CARGOS = gera_planilha.cargos_participacao
+PARTICIPACOES = gera_planilha.matriz_participacoes
+BATIZADOS = np.array([cargo not in gera_planilha.cargos_nao_batizados for cargo in CARGOS])
+ANOS_MINIMOS = np.array([ANOS_MINIMOS_BATISMO.get(cargo, 1) for cargo in CARGOS])
+
+def datas(rng, anos):
+    """datetime64 nos anos dados (datas_aleatorias do gera_planilha)"""
+    return pd.Series(gera_planilha.datas_aleatorias(rng, anos).astype("datetime64[us]"))
+
+def sortear_cargos(rng, genero, idade):
+    """Código do cargo de cada pessoa, sorteado pelas proporções de CARGOS_POR_FAIXA"""
+    faixa = np.where(idade >= 21, "adulto", np.where(idade >= 12, "jovem", "crianca"))
+    codigos = np.zeros(len(idade), dtype=int)
+    for (genero_faixa, nome_faixa), pesos in CARGOS_POR_FAIXA.items():
+        alvo = np.flatnonzero((genero == genero_faixa) & (faixa == nome_faixa))
+        codigos[alvo] = rng.choice([CARGOS.index(cargo) for cargo in pesos], len(alvo),
+                                   p=np.array(list(pesos.values())) / sum(pesos.values()))
+    return codigos
+
+def gerar_familias(rng, familias, ano_atual, agora):
+    """
+    DataFrame com as pessoas de `familias` famílias (pai, mãe e de 0 a 3
+    filhos), na ordem da planilha, e o tamanho de cada família
+    """
+    filhos_por_familia = rng.integers(0, TAMANHO_MAXIMO_FAMILIA - 1, familias)
+    tamanhos = filhos_por_familia + 2
+    total = int(tamanhos.sum())
+    familia_de = np.repeat(np.arange(familias), tamanhos)
+    inicio_familia = np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+    posicao = np.arange(total) - inicio_familia
+    pai, mae, filho = posicao == 0, posicao == 1, posicao >= 2
+
+    genero = np.where(pai, "M", np.where(mae, "F", rng.choice(["M", "F"], total)))
+    idade_pai = rng.integers(30, 81, familias)
+    idade_mae = rng.integers(28, 76, familias)
+    # Filhos com pelo menos 16 anos a menos que o pai e a mãe
+    idade_maxima_filho = np.minimum(idade_pai, idade_mae)[familia_de] - 16
+    idade = np.where(pai, idade_pai[familia_de], np.where(mae, idade_mae[familia_de],
+                                                          rng.integers(5, idade_maxima_filho + 1)))
+
+    sobrenome = rng.choice(gera_planilha.last_names, familias)[familia_de]
+    primeiro_nome = np.where(genero == "M", rng.choice(gera_planilha.first_names_male, total),
+                             rng.choice(gera_planilha.first_names_female, total))
+    nome = pd.Series(primeiro_nome, dtype=str) + " " + pd.Series(sobrenome, dtype=str)
+    email = (nome.str.lower().str.replace(" ", ".", regex=False) + "."
+             + pd.Series(rng.integers(1, 10000, total)).astype(str) + "@"
+             + pd.Series(rng.choice(DOMINIOS, total), dtype=str))
+    telefone = ("(" + pd.Series(rng.integers(11, 100, total)).astype(str) + ") "
+                + pd.Series(rng.integers(90000, 100000, total)).astype(str) + "-"
+                + pd.Series(rng.integers(1000, 10000, total)).astype(str))
+
+    nascimento = datas(rng, ano_atual - idade)
+    cargo = sortear_cargos(rng, genero, idade)
+    # Batismo entre 10 anos após o nascimento e os anos mínimos exigidos pelo cargo
+    # (quem não é batizado sorteia um ano qualquer, descartado)
+    batizado = BATIZADOS[cargo]
+    ano_batismo = rng.integers(np.where(batizado, ano_atual - idade + 10, ano_atual),
+                               np.where(batizado, ano_atual - ANOS_MINIMOS[cargo], ano_atual) + 1)
+    batismo = datas(rng, ano_batismo).where(batizado)
+
+    user_id = gera_planilha.uuids_aleatorios(rng, total)
+    family_id = gera_planilha.uuids_aleatorios(rng, familias)[familia_de]
+    id_pai_familia = user_id[inicio_familia]
+    id_mae_familia = user_id[inicio_familia + 1]
+    menor = idade < 18
+    sem_valor = np.array(None, dtype=object)
+
+    df = pd.DataFrame({
+        "family_id": family_id,
+        "user_id": user_id,
+        "nome": nome,
+        "familia": sobrenome,
+        "idade": idade,
+        "genero": genero,
+        "email": email,
+        "telefone": telefone,
+        "data_batismo": batismo,
+        "cargo": np.array(CARGOS)[cargo],
+        "ativo": True,
+        "observacoes": rng.choice(OBSERVACOES, total),
+        "created_at": agora,
+        "updated_at": agora,
+        "estado_civil": np.where(pai | mae, "casado",
+                                 np.where(menor, "solteiro", rng.choice(ESTADOS_CIVIS_ADULTOS, total))),
+        "papel_familiar": np.where(pai, "pai", np.where(mae, "mae", np.where(genero == "M", "filho", "filha"))),
+        "id_pai": np.where(filho, id_pai_familia, sem_valor),
+        "id_mae": np.where(filho, id_mae_familia, sem_valor),
+        "id_conjuge": np.where(pai, id_mae_familia, np.where(mae, id_pai_familia, sem_valor)),
+        "coabitacao": rng.random(total) > 0.1,
+        "menor": menor,
+        "responsavel_primario": np.where(filho & menor, id_pai_familia, sem_valor),
+        "responsavel_secundario": np.where(filho & menor, id_mae_familia, sem_valor),
+    })
+    df[gera_planilha.particip_cols] = PARTICIPACOES[cargo]
+    df["data_nascimento"] = nascimento
+    for col in ("id_pai", "id_mae", "id_conjuge", "responsavel_primario", "responsavel_secundario"):
+        df[col] = df[col].astype(str)
+    return df, tamanhos
+
+def iter_estudantes(rows, seed=42, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Gera DataFrames de até chunk_size estudantes (colunas de COLUNAS_MODELO)
+    até completar rows. Famílias não são divididas entre blocos; só a última
+    pode ser cortada para fechar rows, e as referências a quem ficou de fora
+    são apagadas
+    """
+    if rows < 0 or chunk_size < TAMANHO_MAXIMO_FAMILIA:
+        raise ValueError(f"rows não pode ser negativo e chunk_size deve ser pelo menos {TAMANHO_MAXIMO_FAMILIA}")
+    rng = np.random.default_rng(seed)
+    ano_atual = datetime.now().year
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    geradas = 0
+    while geradas < rows:
+        alvo = min(chunk_size, rows - geradas)
+        # Famílias têm de 2 a 5 pessoas: alvo // 2 + 1 famílias sempre bastam
+        df, tamanhos = gerar_familias(rng, alvo // 2 + 1, ano_atual, agora)
+        ultimo = rows - geradas == alvo
+        inteiras = int(np.searchsorted(np.cumsum(tamanhos), alvo, side="right"))
+        linhas = alvo if ultimo else int(tamanhos[:inteiras].sum())
+        df = df.iloc[:linhas].reset_index(drop=True)
+        if ultimo:
+            for col in ("id_pai", "id_mae", "id_conjuge", "responsavel_primario", "responsavel_secundario"):
+                df[col] = df[col].where(df[col].isin(df["user_id"]))
+        geradas += len(df)
+        yield df
+
+def write_parquet(frames, path):
+    """Grava os blocos num arquivo Parquet, um row group por bloco. Retorna o total de linhas"""
+    if not HAS_PYARROW:
+        raise RuntimeError("pyarrow é necessário para gravar Parquet: pip install pyarrow")
+    total = 0
+    writer = None
+    try:
+        for df in frames:
+            tabela = pa.Table.from_pandas(df, preserve_index=False,
+                                          schema=writer.schema if writer is not None else None)
+            if writer is None:
+                writer = pq.ParquetWriter(path, tabela.schema)
+            writer.write_table(tabela)
+            total += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+def write_ndjson(frames, path):
+    """Grava os blocos em JSON Lines (datas em ISO 8601). Retorna o total de linhas"""
+    total = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for df in frames:
+            f.write(df.to_json(orient="records", lines=True, date_format="iso", force_ascii=False))
+            total += len(df)
+    return total
+
+def write_xlsx(frames, path):
+    """Grava os blocos numa planilha (openpyxl write-only). Retorna o total de linhas"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Estudantes")
+    sheet.append(COLUNAS_MODELO)
+    total = 0
+    for df in frames:
+        total += len(df)
+        if total > MAX_LINHAS_XLSX:
+            raise ValueError(f"Uma planilha XLSX comporta no máximo {MAX_LINHAS_XLSX} estudantes")
+        valores = df.astype(object).where(df.notna(), None)
+        for linha in valores.itertuples(index=False, name=None):
+            sheet.append(linha)
+    workbook.save(path)
+    return total
+
+WRITERS = {'parquet': write_parquet, 'ndjson': write_ndjson, 'xlsx': write_xlsx}
+
+def write_estudantes(path, rows, seed=42, chunk_size=DEFAULT_CHUNK_SIZE, formato=None):
+    """Gera rows estudantes e grava em path; o formato sai da extensão se não for informado"""
+    if formato is None:
+        formato = {'.parquet': 'parquet', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}.get(
+            os.path.splitext(path)[1].lower(), 'xlsx')
+    return WRITERS[formato](iter_estudantes(rows, seed, chunk_size), path)
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Gera estudantes fictícios em grande volume para testes de carga")
+    parser.add_argument("--rows", type=int, required=True, help="Quantidade de estudantes")
+    parser.add_argument("--output", required=True,
+                        help="Arquivo de saída (.parquet, .ndjson/.jsonl ou .xlsx)")
+    parser.add_argument("--format", choices=FORMATOS,
+                        help="Formato de saída (padrão: pela extensão do arquivo)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador (padrão: 42)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Estudantes gerados e gravados por bloco (padrão: {DEFAULT_CHUNK_SIZE})")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    try:
+        total = write_estudantes(args.output, args.rows, args.seed, args.chunk_size, args.format)
+    except (RuntimeError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    segundos = time.perf_counter() - inicio
+    print(f"✅ {total} estudantes gerados em {segundos:.1f}s ({total / segundos:.0f} linhas/s): {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Leitura incremental de planilhas Excel (.xlsx) usando o modo read-only do openpyxl
+Os dados são entregues em blocos de tamanho fixo, então a memória usada não cresce
+com o tamanho da planilha
+"""
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+# Quantidade padrão de linhas por bloco
+DEFAULT_CHUNK_SIZE = 5000
+
+def iter_excel_frames(excel_file_path, chunk_size=DEFAULT_CHUNK_SIZE, sheet_name=None):
+    """
+    Gera DataFrames de até chunk_size linhas lidos da planilha
+
+    A primeira linha da planilha é o cabeçalho. O índice de cada bloco continua
+    a numeração do bloco anterior, então corresponde à linha de dados na planilha.
+    Os tipos são inferidos bloco a bloco: uma coluna com valores de tipos
+    misturados (ex.: 'true' e 1) pode ser convertida de forma diferente da
+    leitura completa com pd.read_excel.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size deve ser maior que zero")
+
+    workbook = load_workbook(excel_file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = sheet.iter_rows()
+
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [_convert_cell(cell) for cell in header]
+        width = len(header)
+
+        buffer = []
+        blank_rows = 0
+        start = 0
+        for row in rows:
+            values = [_convert_cell(cell) for cell in row]
+            if all(value == "" for value in values):
+                # Linhas vazias no meio são mantidas e as do final descartadas,
+                # como no pd.read_excel
+                blank_rows += 1
+                continue
+            buffer.extend([""] * width for _ in range(blank_rows))
+            blank_rows = 0
+            buffer.append((values + [""] * width)[:width])
+            if len(buffer) >= chunk_size:
+                yield _to_frame(header, buffer[:chunk_size], start)
+                start += chunk_size
+                buffer = buffer[chunk_size:]
+
+        while buffer:
+            yield _to_frame(header, buffer[:chunk_size], start)
+            start += chunk_size
+            buffer = buffer[chunk_size:]
+    finally:
+        workbook.close()
+
+def _convert_cell(cell):
+    """Converte a célula como o leitor openpyxl do pandas (vazio -> "", inteiros sem casas)"""
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return float("nan")
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+def _to_frame(header, rows, start):
+    """
+    Monta o DataFrame de um bloco com a mesma inferência de tipos do pd.read_excel,
+    mantendo a numeração global das linhas no índice
+    """
+    df = TextParser([header] + rows, header=0, skip_blank_lines=False).read()
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Cache local das planilhas já lidas, endereçado pelo conteúdo do arquivo
+O DataFrame lido de cada planilha/aba é salvo em formato colunar (Feather)
+ao lado da planilha e recarregado nas próximas execuções enquanto o arquivo não
+mudar. Colunas object (tipos misturados, booleanos com células vazias) são
+gravadas como texto com o tipo de cada célula no primeiro caractere e
+reconstruídas tipo a tipo na leitura. Sem pyarrow, ou com células de outros
+tipos ou nomes de coluna repetidos, a planilha é lida sem cache; nada é
+gravado nem lido com pickle
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, time as time_of_day, timedelta
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Pasta do cache, criada ao lado da planilha
+CACHE_DIR_NAME = ".planilha_cache"
+
+# Limites de remoção (entradas mais antigas que isso ou além do tamanho total)
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Entradas do cache; .pkl são de versões anteriores, nunca lidas, só removidas
+CACHE_EXTENSIONS = (".feather", ".pkl")
+
+# Chave, nos metadados do Feather, das posições das colunas object codificadas
+TYPED_COLUMNS_KEY = b"planilha_cache.typed_columns"
+
+# Primeiro caractere do texto de cada célula das colunas object → conversão do restante
+CELL_DECODERS = {
+    "s": lambda text: text.to_numpy(dtype=object),
+    "b": lambda text: text.eq("1").to_numpy(dtype=bool).astype(object),
+    "i": lambda text: text.astype("int64").to_numpy().astype(object),
+    "f": lambda text: text.astype("float64").to_numpy().astype(object),
+    "n": lambda text: np.full(len(text), np.nan, dtype=object),
+    "d": lambda text: pd.to_datetime(text.to_numpy(), format="ISO8601").to_pydatetime(),
+    "t": lambda text: text.map(time_of_day.fromisoformat).to_numpy(dtype=object),
+    "r": lambda text: pd.to_timedelta(text.astype("int64").to_numpy(), unit="ns").to_pytimedelta(),
+}
+INT64_LIMITS = (np.iinfo(np.int64).min, np.iinfo(np.int64).max)
+
+def read_excel_cached(excel_file_path, sheet_name=0, use_cache=True, cache_dir=None,
+                      max_age_days=DEFAULT_MAX_AGE_DAYS, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Lê a planilha como pd.read_excel, reaproveitando o cache quando o conteúdo
+    do arquivo e a aba forem os mesmos de uma leitura anterior
+
+    use_cache=False ignora o cache (não lê nem grava).
+    """
+    if not use_cache or not HAS_PYARROW:
+        return pd.read_excel(excel_file_path, sheet_name=sheet_name)
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(excel_file_path)), CACHE_DIR_NAME)
+    base_path = os.path.join(cache_dir, cache_key(excel_file_path, sheet_name))
+
+    df = _load(base_path)
+    if df is not None:
+        return df
+
+    df = pd.read_excel(excel_file_path, sheet_name=sheet_name)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _store(df, base_path)
+        evict_cache(cache_dir, max_age_days, max_bytes)
+    except OSError as e:
+        print(f"⚠️  Não foi possível gravar o cache da planilha: {e}")
+    return df
+
+def cache_key(excel_file_path, sheet_name=0):
+    """Chave do cache: SHA-256 do conteúdo do arquivo + nome da aba"""
+    digest = hashlib.sha256()
+    with open(excel_file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    sheet = re.sub(r"[^0-9A-Za-z_-]+", "_", str(sheet_name))
+    return f"{digest.hexdigest()}-{sheet}"
+
+def evict_cache(cache_dir, max_age_days=DEFAULT_MAX_AGE_DAYS, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Remove entradas sem uso há mais de max_age_days e, se o total ainda passar
+    de max_bytes, as menos usadas recentemente. Retorna quantas foram removidas
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(CACHE_EXTENSIONS):
+            continue
+        path = os.path.join(cache_dir, name)
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    removed = 0
+    limite = time.time() - max_age_days * 86400
+    total = sum(size for _, size, _ in entries)
+    # Mais antigas primeiro
+    for mtime, size, path in sorted(entries):
+        if mtime >= limite and total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+    return removed
+
+def clear_cache(cache_dir):
+    """Remove todas as entradas do cache"""
+    return evict_cache(cache_dir, max_age_days=0, max_bytes=0)
+
+def _load(base_path):
+    """Carrega a entrada do cache, se existir, marcando-a como usada agora"""
+    path = base_path + ".feather"
+    if not os.path.exists(path):
+        return None
+    try:
+        df = _read_feather(path)
+    except Exception as e:
+        print(f"⚠️  Cache da planilha inválido, relendo o arquivo: {e}")
+        os.remove(path)
+        return None
+    os.utime(path)
+    return df
+
+def _store(df, base_path):
+    """
+    Grava o DataFrame no cache (Feather) de forma atômica. Planilhas que o
+    cache não representa sem perdas (nomes de coluna repetidos, células de
+    tipos não suportados) não são gravadas
+    """
+    if not df.columns.is_unique:
+        print("⚠️  Planilha com nomes de coluna repetidos, lida sem cache")
+        return
+    tmp_path = base_path + ".feather.tmp"
+    try:
+        _write_feather(df, tmp_path)
+        os.replace(tmp_path, base_path + ".feather")
+    except (ValueError, TypeError, pyarrow.ArrowException) as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"⚠️  Planilha lida sem cache: {e}")
+
+def _write_feather(df, path):
+    """
+    Grava df em Feather. As colunas object viram texto com o tipo de cada
+    célula no primeiro caractere (ver _cell_text) e suas posições ficam nos
+    metadados, pois o Arrow não guarda tipos misturados e troca NaN por None
+    """
+    typed = [j for j in range(df.shape[1]) if df.dtypes.iloc[j] == object]
+    if typed:
+        df = df.copy()
+        for j in typed:
+            df.isetitem(j, df.iloc[:, j].map(_cell_text).astype(object))
+    table = pyarrow.Table.from_pandas(df)
+    metadata = dict(table.schema.metadata or {})
+    metadata[TYPED_COLUMNS_KEY] = json.dumps(typed).encode()
+    pyarrow.feather.write_feather(table.replace_schema_metadata(metadata), path)
+
+def _read_feather(path):
+    """Lê uma entrada gravada por _write_feather, reconstruindo as colunas object"""
+    table = pyarrow.feather.read_table(path)
+    typed = json.loads((table.schema.metadata or {}).get(TYPED_COLUMNS_KEY, b"[]"))
+    df = table.to_pandas()
+    for j in typed:
+        df.isetitem(j, _decode_cells(df.iloc[:, j]))
+    return df
+
+def _cell_text(value):
+    """Texto de uma célula de coluna object, com o tipo no primeiro caractere (None fica nulo)"""
+    if value is None:
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return "b1" if value else "b0"
+    if isinstance(value, str):
+        return "s" + value
+    if isinstance(value, (int, np.integer)) and INT64_LIMITS[0] <= value <= INT64_LIMITS[1]:
+        return "i" + str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return "n" if value != value else "f" + repr(float(value))
+    if isinstance(value, datetime) and value is not pd.NaT and value.tzinfo is None:
+        return "d" + value.isoformat()
+    if isinstance(value, time_of_day) and value.tzinfo is None:
+        return "t" + value.isoformat()
+    if isinstance(value, timedelta) and value is not pd.NaT:
+        return "r" + str(pd.Timedelta(value).value)
+    raise ValueError(f"célula do tipo {type(value).__name__} ({value!r}) não suportada pelo cache")
+
+def _decode_cells(texts):
+    """Reconstrói uma coluna object a partir dos textos gravados por _cell_text"""
+    values = np.full(len(texts), None, dtype=object)
+    present = texts.notna().to_numpy()
+    kinds = texts.str[0].to_numpy(dtype=object, na_value=None)
+    rest = texts.str[1:]
+    for kind, decode in CELL_DECODERS.items():
+        mask = present & (kinds == kind)
+        if mask.any():
+            values[mask] = decode(rest[mask])
+    return pd.Series(values, index=texts.index, name=texts.name, dtype=object)
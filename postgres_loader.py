@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Direct Postgres loading for the estudantes rows
+Chunks are streamed with COPY (or, where COPY is not allowed, parameterized
+INSERTs) through a small pool of psycopg connections, one transaction per chunk.
+Each chunk is recorded in a progress table inside the same transaction, so a
+failed load can be resumed after the committed chunks
+"""
+
+import contextlib
+import logging
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+try:
+    import psycopg
+    from psycopg import sql
+    HAS_PSYCOPG = True
+except ImportError:
+    HAS_PSYCOPG = False
+
+DEFAULT_TABLE = "public.estudantes"
+DEFAULT_POOL_SIZE = 2
+
+# Rows per executemany of the INSERT loader; a failing batch is bisected down to the bad rows
+DEFAULT_INSERT_BATCH = 500
+
+# Committed chunks of each load, written in the same transaction as the chunk's rows
+PROGRESS_TABLE = "public.estudantes_load_progress"
+
+class LoadError(Exception):
+    """A chunk failed; the chunks committed before it are kept and skipped on the next run"""
+
+    def __init__(self, chunk, error):
+        super().__init__(f"chunk {chunk} failed: {error}")
+        self.chunk = chunk
+        self.error = error
+
+class ConnectionPool:
+    """Fixed-size pool of psycopg connections shared by the loader threads"""
+
+    def __init__(self, dsn, size=DEFAULT_POOL_SIZE):
+        require_psycopg()
+        self.dsn = dsn
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(psycopg.connect(dsn))
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            # Replace connections that were dropped by the server
+            if conn.closed or conn.broken:
+                conn = psycopg.connect(self.dsn)
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().close()
+
+class AbortedPipelineFilter(logging.Filter):
+    """
+    Drop psycopg's warning about the pipeline aborted by a failed executemany;
+    the error itself is raised and handled by the INSERT loader's bisection
+    """
+
+    def filter(self, record):
+        return not record.getMessage().startswith("error ignored terminating")
+
+def require_psycopg():
+    if not HAS_PSYCOPG:
+        raise RuntimeError("psycopg is required for direct loading: pip install \"psycopg[binary]\"")
+
+def table_identifier(table):
+    """'schema.table' as a quoted identifier"""
+    return sql.Identifier(*table.split('.'))
+
+def ensure_progress_table(conn):
+    conn.execute(sql.SQL(
+        "CREATE TABLE IF NOT EXISTS {} ("
+        "load_id TEXT NOT NULL, chunk INTEGER NOT NULL, rows INTEGER NOT NULL, "
+        "committed_at TIMESTAMPTZ NOT NULL DEFAULT now(), PRIMARY KEY (load_id, chunk))"
+    ).format(table_identifier(PROGRESS_TABLE)))
+    conn.commit()
+
+def committed_chunks(conn, load_id):
+    """Chunk numbers already committed for this load"""
+    rows = conn.execute(sql.SQL("SELECT chunk FROM {} WHERE load_id = %s").format(table_identifier(PROGRESS_TABLE)),
+                        (load_id,)).fetchall()
+    conn.commit()
+    return {chunk for chunk, in rows}
+
+def copy_chunk(pool, table, columns, data, load_id, chunk, rows):
+    """COPY one chunk (text format data) and record it as committed, in a single transaction"""
+    statement = sql.SQL("COPY {} ({}) FROM STDIN").format(
+        table_identifier(table), sql.SQL(', ').join(map(sql.Identifier, columns)))
+    with pool.connection() as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                with cur.copy(statement) as copy:
+                    copy.write(data)
+                cur.execute(sql.SQL("INSERT INTO {} (load_id, chunk, rows) VALUES (%s, %s, %s)")
+                            .format(table_identifier(PROGRESS_TABLE)), (load_id, chunk, rows))
+    return rows
+
+def insert_chunk(pool, table, columns, rows, load_id, chunk, first_row, batch_size=DEFAULT_INSERT_BATCH):
+    """
+    INSERT one chunk (rows of parameters) with a prepared statement, each batch
+    sent by executemany in pipeline mode, and record it as committed, in a
+    single transaction. Each batch runs in a savepoint; a failing batch is split
+    in halves until the rows that violate a constraint are isolated and
+    rejected, the other rows are kept.
+    Returns (rows loaded, [(row number, row, error)])
+    """
+    statement = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
+        table_identifier(table), sql.SQL(', ').join(map(sql.Identifier, columns)),
+        sql.SQL(', ').join(sql.Placeholder() * len(columns)))
+    rejects = []
+
+    def insert(conn, start, batch):
+        try:
+            with conn.transaction():
+                with conn.cursor() as cur:
+                    cur.executemany(statement, batch)
+        except (psycopg.DataError, psycopg.IntegrityError) as e:
+            # Row-level errors (bad value, violated constraint); anything else fails the chunk
+            reject(conn, start, batch, e)
+
+    def reject(conn, start, batch, error):
+        if len(batch) == 1:
+            rejects.append((first_row + start, batch[0], error_message(error)))
+            return
+        half = len(batch) // 2
+        insert(conn, start, batch[:half])
+        insert(conn, start + half, batch[half:])
+
+    with pool.connection() as conn:
+        # Server-side prepared statement from the first execution
+        conn.prepare_threshold = 0
+        with conn.transaction():
+            for start in range(0, len(rows), batch_size):
+                insert(conn, start, rows[start:start + batch_size])
+            conn.execute(sql.SQL("INSERT INTO {} (load_id, chunk, rows) VALUES (%s, %s, %s)")
+                         .format(table_identifier(PROGRESS_TABLE)), (load_id, chunk, len(rows) - len(rejects)))
+    return len(rows) - len(rejects), rejects
+
+def error_message(error):
+    """First line of a psycopg error, e.g. the violated constraint"""
+    diag = getattr(error, 'diag', None)
+    message = diag.message_primary if diag is not None and diag.message_primary else str(error)
+    return message.splitlines()[0] if message else type(error).__name__
+
+def load_copy(dsn, frames, render, load_id, table=DEFAULT_TABLE, pool_size=DEFAULT_POOL_SIZE):
+    """
+    Load the frames (chunks in a stable order) into table with COPY
+
+    render(df) returns (columns, COPY text data) for one chunk; it is only called
+    for chunks that still have to be loaded. Up to pool_size chunks are copied
+    concurrently, each in its own transaction. Returns a summary dict; raises
+    LoadError when a chunk fails, after the chunks in flight have finished
+    """
+    def load_chunk(pool, columns, data, chunk, first_row, rows):
+        return copy_chunk(pool, table, columns, data, load_id, chunk, rows), []
+
+    return load_chunks(dsn, frames, render, load_id, pool_size, load_chunk)
+
+def load_insert(dsn, frames, render, load_id, table=DEFAULT_TABLE, pool_size=DEFAULT_POOL_SIZE,
+                batch_size=DEFAULT_INSERT_BATCH):
+    """
+    Load the frames into table with parameterized INSERTs, for roles that
+    cannot COPY. render(df) returns (columns, list of parameter tuples).
+    Rows rejected by a constraint are skipped and listed in summary['rejects']
+    as (row number, row, error); the rest of their chunk is committed
+    """
+    def load_chunk(pool, columns, rows, chunk, first_row, count):
+        return insert_chunk(pool, table, columns, rows, load_id, chunk, first_row, batch_size)
+
+    quiet = AbortedPipelineFilter()
+    logging.getLogger("psycopg").addFilter(quiet)
+    try:
+        return load_chunks(dsn, frames, render, load_id, pool_size, load_chunk)
+    finally:
+        logging.getLogger("psycopg").removeFilter(quiet)
+
+def load_chunks(dsn, frames, render, load_id, pool_size, load_chunk):
+    """
+    Run load_chunk(pool, columns, data, chunk, first row number, rows) for every
+    chunk not committed yet, up to pool_size at a time. load_chunk returns
+    (rows loaded, rejects). Returns the summary dict with the rows per second
+    """
+    pool = ConnectionPool(dsn, pool_size)
+    summary = {"loaded_chunks": 0, "loaded_rows": 0, "skipped_chunks": 0, "skipped_rows": 0, "rejects": []}
+    started = time.perf_counter()
+    try:
+        with pool.connection() as conn:
+            ensure_progress_table(conn)
+            done = committed_chunks(conn, load_id)
+
+        failure = None
+        pending = {}
+
+        def collect(futures):
+            nonlocal failure
+            for future in futures:
+                chunk = pending.pop(future)
+                try:
+                    rows, rejects = future.result()
+                except Exception as e:
+                    if failure is None or chunk < failure.chunk:
+                        failure = LoadError(chunk, e)
+                    continue
+                summary["loaded_chunks"] += 1
+                summary["loaded_rows"] += rows
+                summary["rejects"].extend(rejects)
+                rejected = f", {len(rejects)} rejected" if rejects else ""
+                print(f"  ... chunk {chunk} committed ({rows} rows{rejected})")
+
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            first_row = 1
+            for chunk, df in enumerate(frames, start=1):
+                if chunk in done:
+                    summary["skipped_chunks"] += 1
+                    summary["skipped_rows"] += len(df)
+                    first_row += len(df)
+                    continue
+                columns, data = render(df)
+                future = executor.submit(load_chunk, pool, columns, data, chunk, first_row, len(df))
+                pending[future] = chunk
+                first_row += len(df)
+                # Keep at most two chunks per connection rendered in memory
+                if len(pending) >= 2 * pool_size:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                if failure is not None:
+                    break
+            collect(wait(pending).done)
+
+        if failure is not None:
+            raise failure
+        summary["rejects"].sort(key=lambda reject: reject[0])
+        summary["seconds"] = time.perf_counter() - started
+        summary["rows_per_sec"] = summary["loaded_rows"] / summary["seconds"] if summary["seconds"] else 0.0
+        return summary
+    finally:
+        pool.close()
@@ -0,0 +1,11 @@
+"""Torna importáveis os scripts da raiz e de docs/Oficial (que não são pacotes)"""
+
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OFICIAL = os.path.join(RAIZ, "docs", "Oficial")
+
+for caminho in (RAIZ, OFICIAL):
+    if caminho not in sys.path:
+        sys.path.insert(0, caminho)
@@ -0,0 +1,24 @@
+"""Ids estáveis iguais na conversão delta e no upload com --upsert"""
+
+import contextlib
+import io
+
+import pandas as pd
+
+import upload_estudantes
+from convert_excel_to_json import build_records_vectorized
+
+def test_mesmos_ids_na_conversao_e_no_upload():
+    df = pd.DataFrame({
+        "user_id": ["u-1", None, " u-3 ", None],
+        "email": ["a@x.com", "B@X.com ", None, None],
+        "nome": ["Ana", "Bia", "Caio", "Davi"],
+        "idade": [30, 40, 50, 60],
+    })
+    with contextlib.redirect_stdout(io.StringIO()):
+        registros = build_records_vectorized(df, stable_ids=True)
+        ids_upload = upload_estudantes.derive_stable_ids(df)
+    ids_conversao = [registro["id"] for registro in registros]
+    # Linhas com user_id ou email têm o mesmo id; a última não tem chave
+    assert ids_conversao[:3] == ids_upload[:3]
+    assert ids_conversao[3] != ids_upload[3]
@@ -0,0 +1,22 @@
+"""Índice dos vínculos familiares: ciclos e máscara de menores"""
+
+import numpy as np
+import pandas as pd
+
+from estudantes_familias import IndiceFamilias, vinculos_em_ciclo
+
+def test_caminho_entre_ciclos_nao_esta_em_ciclo():
+    # 0 ⇄ 1 e 2 ⇄ 3 são ciclos; 1 → 2 só liga os dois; 4 → 4 é pai de si mesmo; 5 → 0 está fora
+    filhos = np.array([0, 1, 1, 2, 3, 4, 5])
+    pais = np.array([1, 0, 2, 3, 2, 4, 0])
+    em_ciclo = vinculos_em_ciclo(6, filhos, pais)
+    assert em_ciclo.tolist() == [True, True, False, True, True, True, False]
+
+def test_sem_ciclos():
+    assert not vinculos_em_ciclo(4, np.array([0, 1, 2]), np.array([1, 2, 3])).any()
+
+def test_sem_menor_nem_idade():
+    df = pd.DataFrame({"user_id": ["a", "b"], "id_pai": [None, "a"]})
+    indice = IndiceFamilias(df)
+    assert not indice.menor.any()
+    assert len(indice.problemas()["menor_sem_responsavel"]) == 0
@@ -0,0 +1,28 @@
+"""A planilha sintética já segue as regras S-38"""
+
+import contextlib
+import io
+
+import pandas as pd
+
+import estudantes_sinteticos
+import gera_planilha
+
+VINCULOS_VAZIOS = ["id_pai", "id_mae", "id_conjuge"]
+
+def _texto(df):
+    return df.astype(object).where(df.notna(), None).map(str)
+
+def test_corrigir_so_preenche_vinculos_vazios():
+    df = pd.concat(list(estudantes_sinteticos.iter_estudantes(2000, seed=3, chunk_size=500)), ignore_index=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        corrigida = gera_planilha.corrigir_planilha(df.copy(), seed=0)
+        relatorio = gera_planilha.validar_dados(corrigida)
+    antes, depois = _texto(df), _texto(corrigida[df.columns])
+    alteradas = [col for col in df.columns if not antes[col].equals(depois[col])]
+    assert set(alteradas) <= set(VINCULOS_VAZIOS)
+    for col in alteradas:
+        mudou = antes[col] != depois[col]
+        assert df.loc[mudou, col].isna().all()
+        assert corrigida.loc[mudou, col].eq("").all()
+    assert not [regra for regra in relatorio["regras"] if regra["nivel"] == "erro" and regra["total"]]
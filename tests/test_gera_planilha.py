@@ -0,0 +1,43 @@
+"""A planilha corrigida por gera_planilha passa na própria validação"""
+
+import contextlib
+import io
+import os
+
+import pandas as pd
+import pytest
+
+import gera_planilha
+from conftest import OFICIAL
+
+PLANILHAS = ["estudantes_ficticios_corrigido_modelo.xlsx", "estudantes_corrigidos.xlsx"]
+
+@pytest.mark.parametrize("planilha", PLANILHAS)
+@pytest.mark.parametrize("seed", [0, 7, 42])
+def test_corrigida_sem_erros(planilha, seed):
+    df = pd.read_excel(os.path.join(OFICIAL, planilha))
+    with contextlib.redirect_stdout(io.StringIO()):
+        relatorio = gera_planilha.validar_dados(gera_planilha.corrigir_planilha(df, seed=seed))
+    erros = {regra["regra"]: regra["total"] for regra in relatorio["regras"]
+             if regra["nivel"] == "erro" and regra["total"]}
+    assert erros == {}
+    assert relatorio["salvar"]
+
+def _regras(df):
+    with contextlib.redirect_stdout(io.StringIO()):
+        relatorio = gera_planilha.validar_dados(df)
+    return {regra["regra"]: regra["total"] for regra in relatorio["regras"]}
+
+def test_participacoes_contadas_uma_vez():
+    df = pd.read_excel(os.path.join(OFICIAL, PLANILHAS[0]))
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = gera_planilha.corrigir_planilha(df, seed=0)
+    estudante = df.index[df["cargo"].eq("estudante_novo")][:2]
+    # tresures indevido conta só na regra própria; participação permitida ausente não é erro
+    df.loc[estudante[0], "tresures"] = True
+    df.loc[estudante[1], "reading"] = False
+    regras = _regras(df)
+    assert regras["Tresures inválido"] == 1
+    assert regras["Participações fora da regra do cargo"] == 0
+    df.loc[estudante[1], "chairman"] = True
+    assert _regras(df)["Participações fora da regra do cargo"] == 1
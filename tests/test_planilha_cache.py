@@ -0,0 +1,47 @@
+"""Cache das planilhas: as colunas object voltam idênticas e nada é gravado com pickle"""
+
+import contextlib
+import io
+import os
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import planilha_cache
+
+pytest.importorskip("pyarrow")
+
+def _recarregar(df, tmp_path):
+    base = os.path.join(tmp_path, "entrada")
+    with contextlib.redirect_stdout(io.StringIO()):
+        planilha_cache._store(df, base)
+    return planilha_cache._load(base), sorted(os.listdir(tmp_path))
+
+def test_colunas_misturadas_voltam_identicas(tmp_path):
+    df = pd.DataFrame({
+        "pray": ["sim", 1, np.nan, True, None, 2.5, datetime(2020, 1, 2, 3, 4, 5), time(10, 30), timedelta(days=2)],
+        "ativo": [True, False, np.nan, True, True, False, True, False, True],
+        "nome": list("abcdefghi"),
+    })
+    lido, arquivos = _recarregar(df, tmp_path)
+    assert arquivos == ["entrada.feather"]
+    assert list(lido.dtypes) == list(df.dtypes)
+    for coluna in df.columns:
+        assert [repr(v) for v in lido[coluna]] == [repr(v) for v in df[coluna]]
+
+@pytest.mark.parametrize("df", [
+    pd.DataFrame({"a": [1, {"k": 1}]}),
+    pd.DataFrame([[1, 2]], columns=["a", "a"]),
+])
+def test_planilha_nao_representavel_fica_sem_cache(df, tmp_path):
+    lido, arquivos = _recarregar(df, tmp_path)
+    assert lido is None
+    assert arquivos == []
+
+def test_pickle_antigo_nao_e_lido(tmp_path):
+    base = os.path.join(tmp_path, "entrada")
+    pd.DataFrame({"a": [1]}).to_pickle(base + ".pkl")
+    assert planilha_cache._load(base) is None
+    assert planilha_cache.clear_cache(str(tmp_path)) == 1